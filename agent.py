@@ -1,30 +1,42 @@
 import json
 import asyncio
-from typing import Dict, List, Any, TypedDict
-from dataclasses import dataclass
-from langgraph.graph import StateGraph, END
-from langchain_groq import ChatGroq
-import httpx
+import codecs
+import functools
+import hashlib
+import heapq
+import itertools
+import math
+import multiprocessing
+import random
+import importlib.util
+import uuid
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextvars import ContextVar
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager, nullcontext
+from typing import TYPE_CHECKING, Dict, List, Any, AsyncIterator, Awaitable, Callable, Optional, Tuple, TypedDict
+from dataclasses import dataclass, field
 import os
 from fastapi import FastAPI, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
+from starlette.datastructures import Headers, MutableHeaders
 import re
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
-import aiohttp
-from urllib.parse import urljoin, urlparse
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qsl, urlencode
 
-app = FastAPI(title="Web-Scraping Curriculum Designer API", version="3.0.0")
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# langgraph, langchain_groq, aiohttp, httpx and bs4 are imported where they are first used,
+# so the app can answer /health before they have loaded (see load_pipeline)
+if TYPE_CHECKING:
+    import aiohttp
+    import httpx
+    from langchain_groq import ChatGroq
+    from langgraph.graph import StateGraph
 
 # Load environment variables
 load_dotenv()
@@ -32,14 +44,153 @@ load_dotenv()
 # Environment variables
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 SERPER_API_KEY = os.getenv("SERPER_API_KEY")
+SERPER_URL = os.getenv("SERPER_URL", "https://google.serper.dev/search")
+
+# Concurrency limits for content generation
+MAX_CONCURRENT_SUBTOPICS = int(os.getenv("MAX_CONCURRENT_SUBTOPICS", "5"))
+MAX_CONCURRENT_SEARCHES = int(os.getenv("MAX_CONCURRENT_SEARCHES", "5"))
+MAX_CONCURRENT_SCRAPES = int(os.getenv("MAX_CONCURRENT_SCRAPES", "10"))
+MAX_CONCURRENT_LLM_CALLS = int(os.getenv("MAX_CONCURRENT_LLM_CALLS", "8"))
+
+# Shared HTTP connection pools
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "8"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "30"))
+HTTP_DNS_CACHE_SECONDS = int(os.getenv("HTTP_DNS_CACHE_SECONDS", "300"))
+SERPER_POOL_SIZE = int(os.getenv("SERPER_POOL_SIZE", "20"))
+SCRAPE_TIMEOUT_SECONDS = float(os.getenv("SCRAPE_TIMEOUT_SECONDS", "10"))
+
+# Scraped-page cache
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "true").lower() == "true"
+PAGE_CACHE_TTL_SECONDS = int(os.getenv("PAGE_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Serper search result cache
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", str(6 * 60 * 60)))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2048"))
+SEARCH_CACHE_PERSIST = os.getenv("SEARCH_CACHE_PERSIST", "false").lower() == "true"
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# LLM completion cache (backend: memory, disk or none)
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory").lower()
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "4096"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+
+# Whole-curriculum result cache for /generate-curriculum
+CURRICULUM_CACHE_TTL_SECONDS = int(os.getenv("CURRICULUM_CACHE_TTL_SECONDS", str(60 * 60)))
+CURRICULUM_CACHE_MAX_ENTRIES = int(os.getenv("CURRICULUM_CACHE_MAX_ENTRIES", "256"))
+
+# Per-subtopic artifacts and saved curricula reused by /regenerate-curriculum (backend: disk, memory or none)
+ARTIFACT_STORE_BACKEND = os.getenv("ARTIFACT_STORE_BACKEND", "disk").lower()
+ARTIFACT_TTL_SECONDS = int(os.getenv("ARTIFACT_TTL_SECONDS", str(30 * 24 * 60 * 60)))
+ARTIFACT_STORE_MAX_ENTRIES = int(os.getenv("ARTIFACT_STORE_MAX_ENTRIES", "4096"))
+ARTIFACT_STORE_MAX_BYTES = int(os.getenv("ARTIFACT_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Saved-curriculum retrieval (/curricula) and response encoding: JSON uses orjson when installed;
+# JSON and NDJSON bodies of COMPRESS_MIN_BYTES or more are sent as br (needs brotli) or gzip
+CURRICULUM_PAGE_SIZE = int(os.getenv("CURRICULUM_PAGE_SIZE", "10"))
+CURRICULUM_MAX_PAGE_SIZE = int(os.getenv("CURRICULUM_MAX_PAGE_SIZE", "50"))
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+COMPRESS_THREAD_BYTES = 128 * 1024
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/plain")
+
+# Background curriculum jobs
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "32"))
+JOB_DEADLINE_SECONDS = float(os.getenv("JOB_DEADLINE_SECONDS", str(15 * 60)))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(60 * 60)))
+
+# HTML text extraction (backend: auto, lxml or bs4); 0 workers runs it on a thread instead of processes
+EXTRACTOR_BACKEND = os.getenv("EXTRACTOR_BACKEND", "auto").lower()
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Workers are never forked from the threaded server: forkserver where the platform has it, otherwise spawn
+EXTRACT_START_METHOD = os.getenv("EXTRACT_START_METHOD", "forkserver").lower()
+
+# Page downloads stop after SCRAPE_MAX_BYTES; larger declared bodies and non-HTML types are refused
+SCRAPE_MAX_BYTES = int(os.getenv("SCRAPE_MAX_BYTES", str(512 * 1024)))
+SCRAPE_MAX_CONTENT_LENGTH = int(os.getenv("SCRAPE_MAX_CONTENT_LENGTH", str(5 * 1024 * 1024)))
+SCRAPE_CHUNK_BYTES = 16 * 1024
+SCRAPE_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+
+# Hedged scraping: race more search candidates and keep the first good pages
+SCRAPE_HEDGING = os.getenv("SCRAPE_HEDGING", "true").lower() == "true"
+SCRAPE_HEDGE_CANDIDATES = int(os.getenv("SCRAPE_HEDGE_CANDIDATES", "6"))
+SCRAPE_SOURCES = int(os.getenv("SCRAPE_SOURCES", "3"))
+SCRAPE_DEADLINE_SECONDS = float(os.getenv("SCRAPE_DEADLINE_SECONDS", "6"))
+
+# Source text for prompts: scraped pages are split into chunks and the ones most relevant to the
+# subtopic fill SOURCE_BUDGET_CHARS. Scraping stops early once relevant text reaches
+# SOURCE_SATURATION times the budget.
+SOURCE_BUDGET_CHARS = int(os.getenv("SOURCE_BUDGET_CHARS", "2000"))
+SOURCE_CHUNK_CHARS = int(os.getenv("SOURCE_CHUNK_CHARS", "400"))
+SOURCE_SATURATION = float(os.getenv("SOURCE_SATURATION", "2"))
+SOURCE_SEPARATOR = "\n\n---CONTENT SEPARATOR---\n\n"
+
+# Per-run deduplication: pages whose estimated shingle overlap reaches NEAR_DUPLICATE_THRESHOLD
+# count as the same page
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+MINHASH_SIZE = 64
+SHINGLE_WORDS = 5
+
+# Prefetch searches and scrapes for upcoming subtopics while the LLM works on earlier ones;
+# PREFETCH_BUFFER caps how many subtopics' sources are in flight or waiting at once
+PREFETCH_SOURCES = os.getenv("PREFETCH_SOURCES", "true").lower() == "true"
+PREFETCH_BUFFER = int(os.getenv("PREFETCH_BUFFER", "10"))
+
+# Per-domain politeness: concurrency cap, token-bucket rate and circuit breaker for each host.
+# HOST_LIMITS overrides them per domain, e.g. {"youtube.com": {"concurrency": 1, "rate": 0.5}}
+HOST_MAX_CONCURRENCY = int(os.getenv("HOST_MAX_CONCURRENCY", "4"))
+HOST_RATE_PER_SECOND = float(os.getenv("HOST_RATE_PER_SECOND", "4"))
+HOST_BURST = int(os.getenv("HOST_BURST", "8"))
+HOST_LIMITS = json.loads(os.getenv("HOST_LIMITS", "{}"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("BREAKER_COOLDOWN_SECONDS", "60"))
+
+# Groq rate limits (match these to your plan) and retry policy for the LLM scheduler
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TOKENS_PER_MINUTE", "30000"))
+LLM_EXPECTED_COMPLETION_TOKENS = int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "1500"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30"))
+
+# Subtopic generation mode: "separate" (notes call then quiz call per subtopic) or "batched"
+# (notes and quiz for up to LLM_BATCH_SIZE sibling subtopics in one structured call)
+GENERATION_MODE = os.getenv("GENERATION_MODE", "separate").lower()
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "1"))
+
+# LLM call priorities: the outline and final quiz sit on every request's critical path
+PRIORITY_CRITICAL = 0
+PRIORITY_BULK = 1
+
+SCRAPE_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 
 # Pydantic models for FastAPI
 class CurriculumRequest(BaseModel):
     subject: str
     topics: List[str]
+    bypass_cache: bool = False
+    include_timings: bool = False
+    include_content: bool = True
 
 class CurriculumResponse(BaseModel):
     curriculum: Dict[str, Any]
+    run_stats: Optional[Dict[str, Any]] = None
+    timings: Optional[Dict[str, Any]] = None
+    reused_subtopics: Optional[int] = None
+
+class RegenerateRequest(BaseModel):
+    curriculum_id: str
+    add_topics: List[str] = []
+    remove_topics: List[str] = []
+    replace_topics: Dict[str, str] = {}
+    bypass_cache: bool = False
+    include_timings: bool = False
+    include_content: bool = True
 
 # State class for LangGraph
 class CurriculumState(TypedDict):
@@ -48,61 +199,1840 @@ class CurriculumState(TypedDict):
     course_outline: Dict[str, Any]
     detailed_content: Dict[str, Any]
     final_curriculum: Dict[str, Any]
+    bypass_cache: bool
+    run: "CurriculumRun"
+    prefetch: Optional["SourcePrefetcher"]
+    base_curriculum: Optional[Dict[str, Any]]
+    reused: Dict[Tuple[int, int], Dict[str, Any]]
+    artifacts: Dict[Tuple[int, int], Tuple[str, int]]
+    curriculum_id: Optional[str]
+
+CONTENT_SELECTORS = [
+    'main', 'article', '.content', '.post-content', 
+    '.entry-content', '.article-content', '#content',
+    '.tutorial-content', '.lesson-content'
+]
+STRIPPED_TAGS = ["script", "style", "nav", "header", "footer", "aside"]
+MAX_CONTENT_LINES = 100
+MAX_CONTENT_CHARS = 3000
+
+def extract_page_text_bs4(html: str) -> str:
+    """Extract the main readable text of an HTML page (first 100 lines / 3000 characters)"""
+    from bs4 import BeautifulSoup
+    
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Remove script and style elements
+    for script in soup(STRIPPED_TAGS):
+        script.extract()
+    
+    # Extract main content
+    content_text = ""
+    for selector in CONTENT_SELECTORS:
+        content_div = soup.select_one(selector)
+        if content_div:
+            content_text = content_div.get_text(separator='\n', strip=True)
+            break
+    
+    if not content_text:
+        # Fallback to body content
+        content_text = soup.get_text(separator='\n', strip=True)
+    
+    # Clean and limit content
+    lines = [line.strip() for line in content_text.split('\n') if line.strip()]
+    # Take first 100 lines or 3000 characters, whichever is smaller
+    content_text = '\n'.join(lines[:MAX_CONTENT_LINES])
+    return content_text[:MAX_CONTENT_CHARS] if len(content_text) > MAX_CONTENT_CHARS else content_text
+
+def collect_text_lines(strings) -> str:
+    """Join text nodes the way get_text(separator='\\n', strip=True) would, stopping once the budget is filled"""
+    lines = []
+    length = -1
+    for string in strings:
+        for line in string.split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            lines.append(line)
+            length += len(line) + 1
+            if len(lines) >= MAX_CONTENT_LINES or length >= MAX_CONTENT_CHARS:
+                return '\n'.join(lines)[:MAX_CONTENT_CHARS]
+    return '\n'.join(lines)[:MAX_CONTENT_CHARS]
+
+def _selector_xpath(selector: str) -> str:
+    if selector.startswith('.'):
+        return f"//*[contains(concat(' ', normalize-space(@class), ' '), ' {selector[1:]} ')]"
+    if selector.startswith('#'):
+        return f"//*[@id='{selector[1:]}']"
+    return f"//{selector}"
+
+CONTENT_XPATHS = [_selector_xpath(selector) for selector in CONTENT_SELECTORS]
+
+def extract_page_text_lxml(html: str) -> str:
+    """Same extraction as extract_page_text_bs4 on lxml's C parser, reading text only until the budget is filled"""
+    from lxml import etree
+    from lxml import html as lxml_html
+    
+    try:
+        root = lxml_html.document_fromstring(html)
+    except etree.ParserError:
+        return ""
+    etree.strip_elements(root, etree.Comment, *STRIPPED_TAGS, with_tail=False)
+    
+    for xpath in CONTENT_XPATHS:
+        found = root.xpath(xpath)
+        # Match BeautifulSoup: an element without any children does not count as found
+        if found and (len(found[0]) or found[0].text):
+            content_text = collect_text_lines(found[0].itertext())
+            if content_text:
+                return content_text
+            break
+    
+    # Fallback to the whole document
+    return collect_text_lines(root.itertext())
+
+HAS_LXML = importlib.util.find_spec("lxml") is not None
+
+EXTRACTORS = {
+    "bs4": extract_page_text_bs4,
+    "lxml": extract_page_text_lxml
+}
+
+def extract_page_text(html: str, backend: str = EXTRACTOR_BACKEND) -> str:
+    """Extract page text with the configured backend; 'auto' uses lxml when installed"""
+    if backend == "auto":
+        backend = "lxml" if HAS_LXML else "bs4"
+    if backend == "lxml":
+        try:
+            return extract_page_text_lxml(html)
+        except ValueError:
+            # e.g. str input carrying an XML encoding declaration
+            return extract_page_text_bs4(html)
+    return extract_page_text_bs4(html)
+
+def create_extract_pool(workers: int) -> ProcessPoolExecutor:
+    method = EXTRACT_START_METHOD if EXTRACT_START_METHOD in multiprocessing.get_all_start_methods() else "spawn"
+    context = multiprocessing.get_context(method)
+    if method == "forkserver":
+        # The fork server imports this module once; workers fork from it instead of each importing it again
+        context.set_forkserver_preload([extract_page_text.__module__])
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+def start_extract_workers(pool: ProcessPoolExecutor, workers: int):
+    """Start every extraction process and import its parser now, so the first scraped pages do not pay for it; blocking"""
+    # Submitted together, each task finds no idle worker and starts a process of its own
+    for future in [pool.submit(extract_page_text, "") for _ in range(workers)]:
+        future.result()
+
+def normalize_text(text: str) -> str:
+    """Case-fold and collapse whitespace so equivalent queries share cache keys"""
+    return " ".join(text.casefold().split())
+
+# Query parameters dropped from cache keys: these exact names plus anything starting with utm_
+TRACKING_PARAMS = frozenset({"fbclid", "gclid", "ref"})
+TRACKING_PARAM_PREFIX = "utm_"
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL used as a cache key"""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower()
+    if parsed.port and (scheme, parsed.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parsed.port}"
+    path = parsed.path.rstrip('/') or '/'
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PARAM_PREFIX)
+    ))
+    return urlunparse((scheme, host, path, "", query, ""))
+
+# Relevance ranking of scraped text: pages are cut into chunks, scored with BM25 against the
+# subject/topic/subtopic and the best chunks are packed into the prompt's source budget
+CHUNK_STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the this to was were with "
+    "what how why when which who into about their they can will your you introduction overview basics".split()
+)
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Query term weights: the subtopic matters most, the subject mostly breaks ties
+QUERY_WEIGHTS = (("subtopic", 1.0), ("main_topic", 0.5), ("subject", 0.25))
+
+def chunk_terms(text: str) -> List[str]:
+    """Lower-case word terms without stopwords, with a crude plural fold so 'laws' matches 'law'"""
+    terms = []
+    for word in re.findall(r"[a-z0-9]+", text.casefold()):
+        if len(word) < 2 or word in CHUNK_STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+def split_chunks(text: str, chunk_chars: int) -> List[str]:
+    """Group a page's lines into chunks of about chunk_chars, splitting overlong lines at spaces"""
+    chunks = []
+    current: List[str] = []
+    length = 0
+    for line in text.split('\n'):
+        line = line.strip()
+        while len(line) > chunk_chars:
+            cut = line.rfind(' ', 0, chunk_chars)
+            cut = cut if cut > 0 else chunk_chars
+            if current:
+                chunks.append('\n'.join(current))
+                current, length = [], 0
+            chunks.append(line[:cut])
+            line = line[cut:].strip()
+        if not line:
+            continue
+        if current and length + len(line) + 1 > chunk_chars:
+            chunks.append('\n'.join(current))
+            current, length = [], 0
+        current.append(line)
+        length += len(line) + 1
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
+
+def bm25_scores(term_counts: List[Dict[str, int]], lengths: List[int], query: Dict[str, float]) -> List[float]:
+    """Weighted BM25 score of every chunk for the query terms"""
+    terms = list(query)
+    if not term_counts or not terms:
+        return [0.0] * len(term_counts)
+    
+    count = len(lengths)
+    average_length = max(sum(lengths) / count, 1.0)
+    idf = {}
+    for term in terms:
+        document_frequency = sum(1 for counts in term_counts if term in counts)
+        idf[term] = math.log1p((count - document_frequency + 0.5) / (document_frequency + 0.5))
+    scores = []
+    for counts, length in zip(term_counts, lengths):
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+        scores.append(sum(
+            idf[term] * query[term] * counts[term] * (BM25_K1 + 1) / (counts[term] + norm)
+            for term in terms if term in counts
+        ))
+    return scores
+
+class SourceRanker:
+    """Chunks scraped pages as they arrive and packs the chunks most relevant to a subtopic into a budget"""
+    
+    def __init__(self, subject: str, main_topic: str, subtopic: str, budget: int = SOURCE_BUDGET_CHARS, chunk_chars: int = SOURCE_CHUNK_CHARS, saturation: float = SOURCE_SATURATION):
+        parts = {"subject": subject, "main_topic": main_topic, "subtopic": subtopic}
+        self.query: Dict[str, float] = {}
+        for part, weight in QUERY_WEIGHTS:
+            for term in chunk_terms(parts[part]):
+                self.query[term] = max(self.query.get(term, 0.0), weight)
+        self.subtopic_terms = set(chunk_terms(subtopic)) or set(self.query)
+        # A chunk counts toward saturation when it mentions at least half of the subtopic's terms
+        self.min_subtopic_hits = max(1, (len(self.subtopic_terms) + 1) // 2)
+        self.budget = budget
+        self.chunk_chars = chunk_chars
+        self.saturation = saturation
+        self.chunks: List[Tuple[int, int, str]] = []
+        self.term_counts: List[Dict[str, int]] = []
+        self.lengths: List[int] = []
+        self.seen: set = set()
+        self.relevant_chars = 0
+        self.pages = 0
+    
+    def add(self, content: str):
+        """Chunk one page; repeated chunks (navigation, cookie banners) are kept only once"""
+        page = self.pages
+        self.pages += 1
+        for position, chunk in enumerate(split_chunks(content, self.chunk_chars)):
+            fingerprint = normalize_text(chunk)
+            if fingerprint in self.seen:
+                continue
+            self.seen.add(fingerprint)
+            terms = chunk_terms(chunk)
+            counts: Dict[str, int] = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            self.chunks.append((page, position, chunk))
+            self.term_counts.append(counts)
+            self.lengths.append(len(terms))
+            if sum(1 for term in self.subtopic_terms if term in counts) >= self.min_subtopic_hits:
+                self.relevant_chars += len(chunk)
+    
+    @property
+    def saturated(self) -> bool:
+        """Enough relevant text to fill the budget with room to choose; further pages add little"""
+        return self.relevant_chars >= self.budget * self.saturation
+    
+    def pack(self) -> str:
+        """Best-scoring chunks that fit the budget, in page order so excerpts read naturally"""
+        scores = bm25_scores(self.term_counts, self.lengths, self.query)
+        # Stable sort keeps the original order among equally scored (e.g. unmatched) chunks
+        ranked = sorted(range(len(self.chunks)), key=lambda index: -scores[index])
+        chosen = []
+        used = 0
+        for index in ranked:
+            size = len(self.chunks[index][2]) + len(SOURCE_SEPARATOR)
+            if used + size > self.budget:
+                continue
+            chosen.append(index)
+            used += size
+        chosen.sort(key=lambda index: self.chunks[index][:2])
+        
+        parts = []
+        previous_page = None
+        for index in chosen:
+            page, _, chunk = self.chunks[index]
+            if previous_page is not None:
+                parts.append(SOURCE_SEPARATOR if page != previous_page else "\n")
+            parts.append(chunk)
+            previous_page = page
+        return "".join(parts)
+
+def rank_source_text(subject: str, main_topic: str, subtopic: str, scraped_contents: List[str], budget: int = SOURCE_BUDGET_CHARS) -> str:
+    """Most relevant excerpts of the scraped pages, packed into budget characters"""
+    ranker = SourceRanker(subject, main_topic, subtopic, budget=budget)
+    for content in scraped_contents:
+        ranker.add(content)
+    return ranker.pack()
+
+# Near-duplicate detection uses bottom-k MinHash sketches over word shingles
+def minhash_sketch(text: str, size: int = MINHASH_SIZE, shingle_words: int = SHINGLE_WORDS) -> frozenset:
+    """The `size` smallest 64-bit hashes of the text's word shingles"""
+    words = normalize_text(text).split()
+    shingles = {" ".join(words[i:i + shingle_words]) for i in range(max(1, len(words) - shingle_words + 1))}
+    hashes = (int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big") for shingle in shingles)
+    return frozenset(heapq.nsmallest(size, hashes))
+
+def sketch_similarity(a: frozenset, b: frozenset, size: int = MINHASH_SIZE) -> float:
+    """Estimated Jaccard similarity of the texts behind two sketches"""
+    union = heapq.nsmallest(size, a | b)
+    if not union:
+        return 0.0
+    return sum(1 for value in union if value in a and value in b) / len(union)
+
+class CurriculumRun:
+    """What one curriculum run shares across its subtopics: each URL is scraped once, and pages
+    already used by another subtopic (or repeated within one) are kept out of prompts"""
+    
+    def __init__(self, threshold: float = NEAR_DUPLICATE_THRESHOLD, totals: Optional[Dict[str, int]] = None):
+        self.threshold = threshold
+        self.totals = totals
+        self.scrapes: Dict[str, asyncio.Future] = {}
+        self.waiters: Dict[str, int] = {}
+        self.sketches: List[frozenset] = []
+        self.counters = {
+            "scrape_requests": 0, "shared_scrapes": 0, "pages_used": 0,
+            "near_duplicates_dropped": 0, "repeats_dropped": 0, "duplicate_tokens_dropped": 0
+        }
+        self.cleanups: List[Callable[[], None]] = []
+    
+    def close(self):
+        """Release background work tied to the run (e.g. its source prefetcher)"""
+        while self.cleanups:
+            self.cleanups.pop()()
+    
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] += amount
+        if self.totals is not None:
+            self.totals[name] = self.totals.get(name, 0) + amount
+    
+    async def scrape(self, url: str, fetch) -> str:
+        """Scrape a URL once per run; later subtopics join the in-flight or finished download"""
+        key = normalize_url(url)
+        task = self.scrapes.get(key)
+        self.count("scrape_requests")
+        if task is None:
+            task = self.scrapes[key] = asyncio.ensure_future(fetch(url))
+        else:
+            self.count("shared_scrapes")
+        self.waiters[key] = self.waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self.waiters[key] -= 1
+            if not self.waiters[key] and not task.done():
+                # Every subtopic waiting on it gave up (hedging stragglers): stop the download
+                task.cancel()
+                if self.scrapes.get(key) is task:
+                    del self.scrapes[key]
+    
+    def matches(self, sketch: frozenset, sketches: List[frozenset]) -> bool:
+        return any(sketch_similarity(sketch, other) >= self.threshold for other in sketches)
+    
+    def admit(self, content: str, taken: List[frozenset], repeated: List[frozenset]) -> str:
+        """Classify a page against the subtopic's accepted pages (`taken`), its held-back
+        repeats (`repeated`) and the rest of the run
+        
+        Returns "duplicate" (same text already in this prompt), "repeat" (already used by another
+        subtopic) or "new"; new pages are registered for the subtopic and the run.
+        """
+        sketch = minhash_sketch(content)
+        if self.matches(sketch, taken):
+            self.count("near_duplicates_dropped")
+            self.count("duplicate_tokens_dropped", estimate_tokens(content))
+            return "duplicate"
+        if self.matches(sketch, self.sketches):
+            if self.matches(sketch, repeated):
+                self.count("near_duplicates_dropped")
+                self.count("duplicate_tokens_dropped", estimate_tokens(content))
+                return "duplicate"
+            repeated.append(sketch)
+            return "repeat"
+        taken.append(sketch)
+        self.sketches.append(sketch)
+        self.count("pages_used")
+        return "new"
+    
+    def discard_repeats(self, contents: List[str]):
+        for content in contents:
+            self.count("repeats_dropped")
+            self.count("duplicate_tokens_dropped", estimate_tokens(content))
+    
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "unique_urls": len(self.scrapes)}
+
+class SourcePrefetcher:
+    """Searches and scrapes the subtopics of an outline, in outline order, ahead of LLM generation
+    
+    At most `capacity` subtopics are being fetched or held as buffered sources. A new fetch starts
+    only when a consumer leaves its claim() block, so memory stays bounded for any outline size.
+    """
+    
+    def __init__(self, keys: List[Tuple[int, int]], fetch: Callable[[Tuple[int, int]], Awaitable[Any]], capacity: int = PREFETCH_BUFFER, totals: Optional[Dict[str, int]] = None):
+        self.keys = keys
+        self.fetch = fetch
+        self.capacity = capacity
+        self.totals = totals if totals is not None else {}
+        self._slots = asyncio.Semaphore(capacity)
+        self._items: Dict[Tuple[int, int], asyncio.Future] = {}
+        self._fetches: Dict[Tuple[int, int], asyncio.Task] = {}
+        self._producer: Optional[asyncio.Task] = None
+        self.buffered = 0
+    
+    def count(self, name: str):
+        self.totals[name] = self.totals.get(name, 0) + 1
+    
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self._items = {key: loop.create_future() for key in self.keys}
+        self._producer = asyncio.ensure_future(self._produce())
+    
+    async def _produce(self):
+        for key in self.keys:
+            await self._slots.acquire()
+            if self._items[key].done():
+                # Its consumer gave up before the fetch started
+                self._slots.release()
+                continue
+            task = self._fetches[key] = asyncio.ensure_future(self.fetch(key))
+            task.add_done_callback(lambda task, key=key: self._fetched(key, task))
+            self.count("fetches")
+    
+    def _fetched(self, key: Tuple[int, int], task: asyncio.Task):
+        item = self._items.get(key)
+        if item is None or item.done():
+            return
+        if task.cancelled():
+            item.cancel()
+        elif task.exception() is not None:
+            item.set_exception(task.exception())
+        else:
+            item.set_result(task.result())
+            self.buffered += 1
+            self.totals["peak_buffered"] = max(self.totals.get("peak_buffered", 0), self.buffered)
+    
+    @asynccontextmanager
+    async def claim(self, key: Tuple[int, int]):
+        """Wait for a subtopic's sources and keep its buffer slot until the block exits"""
+        item = self._items[key]
+        try:
+            yield await asyncio.shield(item)
+        finally:
+            fetch = self._fetches.pop(key, None)
+            if fetch is None:
+                item.cancel()
+            else:
+                if fetch.done() and not fetch.cancelled() and fetch.exception() is None:
+                    self.buffered -= 1
+                fetch.cancel()
+                del self._items[key]
+                self._slots.release()
+    
+    def close(self):
+        """Stop prefetching; fetches nobody claimed yet are cancelled"""
+        if self._producer is not None:
+            self._producer.cancel()
+        for fetch in self._fetches.values():
+            fetch.cancel()
+        self._fetches.clear()
+
+HAS_ORJSON = importlib.util.find_spec("orjson") is not None
+
+def json_dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON, encoded with orjson when it is installed"""
+    if HAS_ORJSON:
+        import orjson
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+
+# SQLite-backed caches and stores are only touched from this one thread, never from the event loop
+storage_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage")
+# Reads record their LRU touch in memory; it is written with the next write or once this many are pending
+CACHE_TOUCH_BATCH = 64
+
+async def run_storage(store: Any, method: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Call a cache or store method, on the storage thread when the store is backed by SQLite"""
+    if not getattr(store, "blocking", False):
+        return method(*args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(storage_executor, functools.partial(method, *args, **kwargs))
+
+def open_sqlite(path: str) -> sqlite3.Connection:
+    """Open an autocommit SQLite connection shared across threads, creating its directory"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+class MemoryCache:
+    """In-process LRU cache with per-entry TTL, bounded by entry count and optionally by bytes"""
+
+    blocking = False
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._total_bytes = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+        expires_at, value, size = entry
+        if expires_at < time.time():
+            self._remove(key)
+            self.counters["expired"] += 1
+            self.counters["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.counters["hits"] += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, size: int = 0):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.time() + (self.ttl if ttl is None else ttl), value, size)
+        self._total_bytes += size
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+        ):
+            self._remove(next(iter(self._entries)))
+            self.counters["evictions"] += 1
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._total_bytes -= size
+
+    def close(self):
+        self._entries.clear()
+        self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+            "entries": len(self._entries),
+            "total_bytes": self._total_bytes
+        }
+
+class DiskCache:
+    """SQLite key/value cache of JSON values with per-entry TTL and size-bounded LRU eviction"""
+
+    blocking = True
+
+    def __init__(self, path: str, ttl: float = 3600, max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._total_bytes = 0
+        self._touched: Dict[str, float] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = open_sqlite(self.path)
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+            self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.get_raw(key)
+        return json.loads(value) if value is not None else None
+
+    def get_raw(self, key: str) -> Optional[str]:
+        """The stored JSON text, for callers that pass it on without decoding"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, expires_at, size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            value, expires_at, size = row
+            if expires_at < now:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= CACHE_TOUCH_BATCH:
+                self._flush_touches(conn)
+        self.counters["hits"] += 1
+        return value
+
+    def _flush_touches(self, conn: sqlite3.Connection):
+        if self._touched:
+            conn.executemany("UPDATE entries SET accessed_at = ? WHERE key = ?", [(at, key) for key, at in self._touched.items()])
+            self._touched.clear()
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, size: int = 0):
+        # Entries are sized by their encoded JSON, so the size hint is not needed here
+        self.set_raw(key, json.dumps(value), ttl=ttl)
+
+    def set_raw(self, key: str, encoded: str, ttl: Optional[float] = None):
+        """Store JSON text that is already encoded"""
+        size = len(encoded)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            self._flush_touches(conn)
+            previous = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (key, encoded, now + (self.ttl if ttl is None else ttl), now, size)
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            while self._total_bytes > self.max_bytes:
+                row = conn.execute("SELECT key, size FROM entries ORDER BY accessed_at LIMIT 1").fetchone()
+                if row is None:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (row[0],))
+                self._total_bytes -= row[1]
+                self.counters["evictions"] += 1
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._flush_touches(self._conn)
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+            "total_bytes": self._total_bytes
+        }
+
+class TieredCache:
+    """Memory cache in front of an optional disk cache; disk hits are promoted to memory"""
+
+    def __init__(self, memory: MemoryCache, disk: Optional[DiskCache] = None):
+        self.memory = memory
+        self.disk = disk
+        self.blocking = disk is not None
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, size: int = 0):
+        self.memory.set(key, value, ttl=ttl, size=size)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl=ttl, size=size)
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None
+        }
+
+def create_search_cache() -> TieredCache:
+    disk = None
+    if SEARCH_CACHE_PERSIST:
+        disk = DiskCache(
+            os.path.join(CACHE_DIR, "search.sqlite3"),
+            ttl=SEARCH_CACHE_TTL_SECONDS,
+            max_bytes=SEARCH_CACHE_MAX_BYTES
+        )
+    return TieredCache(MemoryCache(SEARCH_CACHE_MAX_ENTRIES, ttl=SEARCH_CACHE_TTL_SECONDS), disk)
+
+class CompletionCache:
+    """Content-addressed cache of LLM completions keyed by model settings and the exact prompt"""
+
+    def __init__(self, backend, ttl: Optional[float] = None):
+        self.backend = backend
+        self.ttl = ttl
+        self.blocking = backend.blocking
+        self.counters = {"hits": 0, "misses": 0, "bypassed": 0, "stores": 0, "tokens_saved": 0}
+
+    @staticmethod
+    def key(llm: Any, prompt: str) -> str:
+        material = json.dumps({
+            "model": getattr(llm, "model_name", None),
+            "temperature": getattr(llm, "temperature", None),
+            "max_tokens": getattr(llm, "max_tokens", None),
+            "prompt": prompt
+        }, sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.backend.get(key)
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        self.counters["tokens_saved"] += entry.get("tokens", 0)
+        return entry["content"]
+
+    def put(self, key: str, content: str, tokens: int = 0, ttl: Optional[float] = None):
+        self.counters["stores"] += 1
+        entry = {"content": content, "tokens": tokens}
+        self.backend.set(key, entry, ttl=ttl or self.ttl, size=len(content))
+
+    def close(self):
+        self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+            "backend": self.backend.stats()
+        }
+
+def create_completion_cache() -> Optional[CompletionCache]:
+    if LLM_CACHE_BACKEND == "memory":
+        backend = MemoryCache(LLM_CACHE_MAX_ENTRIES, ttl=LLM_CACHE_TTL_SECONDS, max_bytes=LLM_CACHE_MAX_BYTES)
+    elif LLM_CACHE_BACKEND == "disk":
+        backend = DiskCache(
+            os.path.join(CACHE_DIR, "completions.sqlite3"),
+            ttl=LLM_CACHE_TTL_SECONDS,
+            max_bytes=LLM_CACHE_MAX_BYTES
+        )
+    else:
+        return None
+    return CompletionCache(backend, ttl=LLM_CACHE_TTL_SECONDS)
+
+class ArtifactStore:
+    """Subtopic artifacts (notes, learning URLs, quiz) stored under a hash of their content, and the saved curricula that reference them
+    
+    Each subject/main topic/subtopic also points at its latest artifact for reuse; a saved curriculum keeps the
+    hashes of the artifacts it was built from, so later generations of the same subtopic never change it.
+    """
+    
+    LATEST_PREFIX = "latest:"
+
+    def __init__(self, artifacts, curricula, ttl: Optional[float] = None):
+        self.artifacts = artifacts
+        self.curricula = curricula
+        self.ttl = ttl
+        self.blocking = artifacts.blocking or curricula.blocking
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "curricula_saved": 0}
+
+    @staticmethod
+    def name_key(subject: str, main_topic: str, subtopic: str) -> str:
+        material = json.dumps([normalize_text(subject), normalize_text(main_topic), normalize_text(subtopic)])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def content_id(encoded: bytes) -> str:
+        return hashlib.sha256(encoded).hexdigest()
+
+    def latest_id(self, subject: str, main_topic: str, subtopic: str) -> Optional[str]:
+        return self.artifacts.get(self.LATEST_PREFIX + self.name_key(subject, main_topic, subtopic))
+
+    def get(self, subject: str, main_topic: str, subtopic: str) -> Optional[Dict[str, Any]]:
+        """The latest artifact stored for these names"""
+        artifact_id = self.latest_id(subject, main_topic, subtopic)
+        artifact = self.artifacts.get(artifact_id) if artifact_id is not None else None
+        self.counters["hits" if artifact is not None else "misses"] += 1
+        return artifact
+
+    def get_encoded(self, artifact_id: Optional[str]) -> Optional[bytes]:
+        """An artifact as the JSON bytes it was hashed from; a disk backend hands back its stored text without a decode/encode round trip"""
+        if artifact_id is None:
+            encoded = None
+        elif isinstance(self.artifacts, DiskCache):
+            raw = self.artifacts.get_raw(artifact_id)
+            encoded = raw.encode('utf-8') if raw is not None else None
+        else:
+            artifact = self.artifacts.get(artifact_id)
+            encoded = json_dumps(artifact) if artifact is not None else None
+        self.counters["hits" if encoded is not None else "misses"] += 1
+        return encoded
+
+    def put(self, subject: str, main_topic: str, subtopic: str, content: Dict[str, Any]) -> Tuple[str, int]:
+        """Store a subtopic's content under its hash, make it the latest for its names and return (artifact id, encoded size)"""
+        self.counters["stores"] += 1
+        encoded = json_dumps(content)
+        artifact_id = self.content_id(encoded)
+        # The disk backend keeps these exact bytes, so the id, the recorded size and what is served all agree
+        if isinstance(self.artifacts, DiskCache):
+            self.artifacts.set_raw(artifact_id, encoded.decode('utf-8'), ttl=self.ttl)
+        else:
+            self.artifacts.set(artifact_id, content, ttl=self.ttl, size=len(encoded))
+        self.artifacts.set(self.LATEST_PREFIX + self.name_key(subject, main_topic, subtopic), artifact_id, ttl=self.ttl, size=len(artifact_id))
+        return artifact_id, len(encoded)
+
+    def save_curriculum(self, record: Dict[str, Any]) -> str:
+        """Save a curriculum's outline and final quiz under a new id; its subtopics live in the artifacts"""
+        curriculum_id = uuid.uuid4().hex
+        self.counters["curricula_saved"] += 1
+        self.curricula.set(curriculum_id, {**record, "curriculum_id": curriculum_id}, ttl=self.ttl)
+        return curriculum_id
+
+    def load_curriculum(self, curriculum_id: str) -> Optional[Dict[str, Any]]:
+        return self.curricula.get(curriculum_id)
+
+    def close(self):
+        self.artifacts.close()
+        self.curricula.close()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+            "artifacts": self.artifacts.stats(),
+            "curricula": self.curricula.stats()
+        }
+
+def create_artifact_store() -> Optional[ArtifactStore]:
+    if ARTIFACT_STORE_BACKEND == "memory":
+        artifacts = MemoryCache(ARTIFACT_STORE_MAX_ENTRIES, ttl=ARTIFACT_TTL_SECONDS, max_bytes=ARTIFACT_STORE_MAX_BYTES)
+        curricula = MemoryCache(ARTIFACT_STORE_MAX_ENTRIES, ttl=ARTIFACT_TTL_SECONDS)
+    elif ARTIFACT_STORE_BACKEND == "disk":
+        artifacts = DiskCache(os.path.join(CACHE_DIR, "artifacts.sqlite3"), ttl=ARTIFACT_TTL_SECONDS, max_bytes=ARTIFACT_STORE_MAX_BYTES)
+        curricula = DiskCache(os.path.join(CACHE_DIR, "curricula.sqlite3"), ttl=ARTIFACT_TTL_SECONDS, max_bytes=ARTIFACT_STORE_MAX_BYTES)
+    else:
+        return None
+    return ArtifactStore(artifacts, curricula, ttl=ARTIFACT_TTL_SECONDS)
+
+# Placeholder quiz used when the LLM's quiz cannot be parsed: (question template, options, correct answer index)
+FALLBACK_QUIZ_QUESTIONS = [
+    ("What is the main concept behind {subtopic}?", ["Fundamental principle", "Practical application", "Theoretical framework", "All of the above"], 3),
+    ("Why is {subtopic} important to learn?", ["It underpins later topics", "It has no practical use", "It is only historical", "It replaces all other topics"], 0),
+    ("Which of these best describes how {subtopic} is applied?", ["By memorising definitions only", "By solving problems with its core ideas", "By avoiding examples", "By ignoring its assumptions"], 1),
+    ("What should you understand first when studying {subtopic}?", ["Advanced edge cases", "Unrelated topics", "Its key terms and definitions", "Only the final results"], 2),
+    ("Which is a common mistake when working with {subtopic}?", ["Checking assumptions", "Practising with examples", "Reviewing definitions", "Applying rules outside their conditions"], 3),
+    ("How does {subtopic} relate to the rest of the course?", ["It builds on earlier concepts and supports later ones", "It is completely independent", "It contradicts the other topics", "It is only needed for exams"], 0),
+    ("What is the best way to check your understanding of {subtopic}?", ["Re-reading the title", "Explaining it and solving practice problems", "Skipping the examples", "Memorising one answer"], 1),
+    ("Which resource is most useful for going deeper into {subtopic}?", ["Unsourced opinions", "Random guesses", "Worked examples and reputable references", "Only the course overview"], 2),
+]
+
+def default_subtopics(topic: str) -> List[str]:
+    """Subtopics used when the LLM outline cannot be parsed"""
+    return [
+        f"Introduction to {topic}",
+        f"Core Concepts of {topic}",
+        f"Practical Applications of {topic}",
+        f"Advanced {topic} Techniques"
+    ]
+
+def outline_entries(topics: List[str], main_topics: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Pair each outline topic with the requested topic it came from: by position when the counts agree, otherwise by name"""
+    if len(topics) == len(main_topics):
+        requested = list(topics)
+    else:
+        by_name = {normalize_text(topic): topic for topic in topics}
+        requested = [by_name.get(normalize_text(main_topic['topic']), main_topic['topic']) for main_topic in main_topics]
+    return [
+        {"request_topic": request_topic, "topic": main_topic['topic'], "subtopics": list(main_topic['subtopics'])}
+        for request_topic, main_topic in zip(requested, main_topics)
+    ]
+
+def apply_topic_diff(topics: List[str], add: List[str], remove: List[str], replace: Dict[str, str]) -> List[str]:
+    """The topic list after an edit: replaced topics keep their position, added ones go last; raises ValueError for unknown topics"""
+    known = {normalize_text(topic) for topic in topics}
+    unknown = [topic for topic in [*remove, *replace] if normalize_text(topic) not in known]
+    if unknown:
+        raise ValueError(f"Topics not in the curriculum: {', '.join(unknown)}")
+    removed = {normalize_text(topic) for topic in remove}
+    replacements = {normalize_text(old): new for old, new in replace.items()}
+    edited = [replacements.get(normalize_text(topic), topic) for topic in topics if normalize_text(topic) not in removed]
+    present = {normalize_text(topic) for topic in edited}
+    for topic in add:
+        if normalize_text(topic) not in present:
+            edited.append(topic)
+            present.add(normalize_text(topic))
+    return edited
+
+def completion_tokens_used(response: Any) -> int:
+    """Total tokens reported for a chat completion, 0 when the provider omits usage"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage.get("total_tokens"):
+        return usage["total_tokens"]
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    return token_usage.get("total_tokens", 0)
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one shared execution"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.counters = {"executions": 0, "coalesced": 0}
+
+    async def run(self, key: str, factory):
+        task = self._inflight.get(key)
+        if task is None:
+            self.counters["executions"] += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.counters["coalesced"] += 1
+        # A waiter that disconnects must not cancel the work shared with the others
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "in_flight": len(self._inflight)}
+
+def curriculum_cache_key(subject: str, topics: List[str]) -> str:
+    """Key identifying a curriculum request: normalized subject plus the order-normalized topics"""
+    return json.dumps([normalize_text(subject), sorted(normalize_text(topic) for topic in topics)])
+
+@dataclass
+class CachedPage:
+    content: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fresh: bool
+
+class PageCache:
+    """SQLite-backed cache of extracted page text with TTL, LRU eviction and revalidation metadata"""
+
+    blocking = True
+
+    def __init__(
+        self,
+        path: str = os.path.join(CACHE_DIR, "pages.sqlite3"),
+        ttl: int = PAGE_CACHE_TTL_SECONDS,
+        max_bytes: int = PAGE_CACHE_MAX_BYTES
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.counters = {
+            "hits": 0, "misses": 0, "stale": 0, "revalidated": 0,
+            "evictions": 0, "bytes_served": 0, "bytes_stored": 0
+        }
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._total_bytes = 0
+        self._touched: Dict[str, float] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = open_sqlite(self.path)
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS pages (
+                    key TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed_at)")
+            self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        return self._conn
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        """Look up a page; expired entries are returned with fresh=False for revalidation"""
+        key = normalize_url(url)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT content, etag, last_modified, fetched_at FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= CACHE_TOUCH_BATCH:
+                self._flush_touches(conn)
+        
+        content, etag, last_modified, fetched_at = row
+        fresh = now - fetched_at < self.ttl
+        if fresh:
+            self.counters["hits"] += 1
+            self.counters["bytes_served"] += len(content.encode('utf-8'))
+        else:
+            self.counters["stale"] += 1
+        return CachedPage(content, etag, last_modified, fresh)
+
+    def put(self, url: str, content: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        key = normalize_url(url)
+        size = len(content.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            self._flush_touches(conn)
+            previous = conn.execute("SELECT size FROM pages WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, content, etag, last_modified, now, now, size)
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self.counters["bytes_stored"] += size
+            self._evict(conn)
+
+    def revalidated(self, url: str):
+        """Mark an expired entry as fresh again after a 304 Not Modified"""
+        key = normalize_url(url)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            self._touched.pop(key, None)
+            row = conn.execute("SELECT size FROM pages WHERE key = ?", (key,)).fetchone()
+            conn.execute("UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+        self.counters["revalidated"] += 1
+        if row:
+            self.counters["bytes_served"] += row[0]
+
+    def _flush_touches(self, conn: sqlite3.Connection):
+        if self._touched:
+            conn.executemany("UPDATE pages SET accessed_at = ? WHERE key = ?", [(at, key) for key, at in self._touched.items()])
+            self._touched.clear()
+
+    def _evict(self, conn: sqlite3.Connection):
+        # Drop least recently used pages until the cache fits its byte budget
+        while self._total_bytes > self.max_bytes:
+            rows = conn.execute(
+                "SELECT key, size FROM pages ORDER BY accessed_at LIMIT 32"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.counters["evictions"] += 1
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._flush_touches(self._conn)
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        # Stale lookups either revalidate (304) or fall through to a full download
+        lookups = self.counters["hits"] + self.counters["misses"] + self.counters["stale"]
+        return {
+            **self.counters,
+            "hit_rate": round((self.counters["hits"] + self.counters["revalidated"]) / lookups, 3) if lookups else 0.0,
+            "total_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes
+        }
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float = 1) -> float:
+        """Seconds until `amount` tokens are available (0 when they already are)"""
+        self._refill()
+        return max(0.0, (min(amount, self.capacity) - self.tokens) / self.rate)
+
+    def take(self, amount: float = 1):
+        """Consume tokens unconditionally; the balance may go negative to record debt"""
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float):
+        """Charge (positive) or refund (negative) tokens once the real cost is known"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+    async def acquire(self, amount: float = 1):
+        while True:
+            wait = self.wait_time(amount)
+            if wait <= 0:
+                self.take(amount)
+                return
+            await asyncio.sleep(wait)
+
+@dataclass
+class RequestOutcome:
+    status: Optional[int] = None
+    # False when the circuit opened while the request waited for its slot and token; nothing may be sent
+    allowed: bool = True
+
+class HostState:
+    """Concurrency slots, request rate and circuit breaker for one scraped domain"""
+
+    def __init__(self, concurrency: int, rate: float, burst: int, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.circuit = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.counters = {"requests": 0, "successes": 0, "failures": 0, "short_circuited": 0, "latency_total": 0.0}
+        self._slots = asyncio.Semaphore(concurrency)
+        self._bucket = TokenBucket(rate, burst)
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Cheap check before queueing for a slot: False while the circuit is open or its half-open probe is out"""
+        if self.circuit == "closed" or self._probe_due():
+            return True
+        self.counters["short_circuited"] += 1
+        return False
+
+    def _probe_due(self) -> bool:
+        if self.circuit == "open":
+            return time.monotonic() - self.opened_at >= self.cooldown
+        return self.circuit == "half_open" and not self._probe_in_flight
+
+    def _admit(self) -> Optional[bool]:
+        """None while the circuit is open, otherwise whether this request is the single half-open probe"""
+        if self.circuit == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+            self.circuit = "half_open"
+        if self.circuit == "closed":
+            return False
+        if self.circuit == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.counters["short_circuited"] += 1
+        return None
+
+    @asynccontextmanager
+    async def request(self):
+        """Hold a slot and a rate token for one request, recording its outcome for the breaker
+        
+        The circuit is checked once both are held, so requests queued before it opened are not sent:
+        they get an outcome with allowed=False and their rate token back.
+        """
+        async with self._slots:
+            await self._bucket.acquire()
+            probe = self._admit()
+            if probe is None:
+                self._bucket.adjust(-1)
+                yield RequestOutcome(allowed=False)
+                return
+            outcome = RequestOutcome()
+            started = time.monotonic()
+            try:
+                yield outcome
+            except Exception:
+                self._record(False, time.monotonic() - started)
+                raise
+            else:
+                failed = outcome.status is not None and (outcome.status in (403, 429) or outcome.status >= 500)
+                self._record(not failed, time.monotonic() - started)
+            finally:
+                # Only the probe itself hands the half-open slot on, however it ends
+                if probe:
+                    self._probe_in_flight = False
+
+    def _record(self, ok: bool, latency: float):
+        self.counters["requests"] += 1
+        self.counters["latency_total"] += latency
+        if ok:
+            self.counters["successes"] += 1
+            self.consecutive_failures = 0
+            self.circuit = "closed"
+            return
+        self.counters["failures"] += 1
+        self.consecutive_failures += 1
+        if self.circuit == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            self.circuit = "open"
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.counters["requests"]
+        return {
+            "circuit": self.circuit,
+            "requests": requests,
+            "successes": self.counters["successes"],
+            "failures": self.counters["failures"],
+            "short_circuited": self.counters["short_circuited"],
+            "success_rate": round(self.counters["successes"] / requests, 3) if requests else None,
+            "avg_latency_ms": round(self.counters["latency_total"] / requests * 1000, 1) if requests else None
+        }
+
+class HostScheduler:
+    """Shared per-domain politeness state for every scrape made by the agent"""
+
+    def __init__(
+        self,
+        concurrency: int = HOST_MAX_CONCURRENCY,
+        rate: float = HOST_RATE_PER_SECOND,
+        burst: int = HOST_BURST,
+        overrides: Optional[Dict[str, Dict[str, Any]]] = None,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        cooldown: float = BREAKER_COOLDOWN_SECONDS
+    ):
+        self.defaults = {"concurrency": concurrency, "rate": rate, "burst": burst}
+        self.overrides = HOST_LIMITS if overrides is None else overrides
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.hosts: Dict[str, HostState] = {}
+
+    @staticmethod
+    def host_key(url: str) -> str:
+        host = (urlparse(url).hostname or "").lower()
+        return host[4:] if host.startswith("www.") else host
+
+    def get(self, url: str) -> HostState:
+        key = self.host_key(url)
+        host = self.hosts.get(key)
+        if host is None:
+            limits = {**self.defaults, **self.overrides.get(key, {})}
+            host = HostState(limits["concurrency"], limits["rate"], limits["burst"], self.failure_threshold, self.cooldown)
+            self.hosts[key] = host
+        return host
+
+    def stats(self) -> Dict[str, Any]:
+        return {key: host.stats() for key, host in sorted(self.hosts.items())}
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for admission control (about four characters per token)"""
+    return len(text) // 4 + 1
+
+def retryable_llm_error(error: Exception) -> Tuple[bool, Optional[float]]:
+    """Whether a failed completion should be retried, plus the server's Retry-After hint"""
+    from groq import APIConnectionError, APIStatusError
+    
+    if isinstance(error, APIStatusError):
+        if error.status_code != 429 and error.status_code < 500:
+            return False, None
+        retry_after = error.response.headers.get("retry-after")
+        try:
+            return True, float(retry_after) if retry_after else None
+        except ValueError:
+            return True, None
+    return isinstance(error, (APIConnectionError, asyncio.TimeoutError)), None
+
+class PrioritySemaphore:
+    """Semaphore that hands freed slots to the lowest priority value first, FIFO within a priority"""
+
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    @asynccontextmanager
+    async def acquire(self, priority: int = PRIORITY_BULK):
+        # Freed slots go straight to a waiter, so a free slot means nobody is queued
+        if self._value > 0:
+            self._value -= 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Handed a slot just as we were cancelled: pass it on
+                    self._release()
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
+
+class LLMScheduler:
+    """Admit LLM calls against requests-per-minute and tokens-per-minute budgets, by priority, with retries"""
+
+    def __init__(
+        self,
+        requests_per_minute: int = GROQ_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = GROQ_TOKENS_PER_MINUTE,
+        expected_completion_tokens: int = LLM_EXPECTED_COMPLETION_TOKENS,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff_base: float = LLM_BACKOFF_BASE_SECONDS,
+        backoff_max: float = LLM_BACKOFF_MAX_SECONDS
+    ):
+        self.request_bucket = TokenBucket(requests_per_minute / 60, requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute / 60, tokens_per_minute)
+        self.expected_completion_tokens = expected_completion_tokens
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.counters = {
+            "admitted": 0, "delayed": 0, "wait_seconds": 0.0, "retries": 0, "rate_limited": 0,
+            "failures": 0, "estimated_tokens": 0, "actual_tokens": 0
+        }
+        self._waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def admit(self, tokens: int, priority: int = PRIORITY_BULK):
+        """Wait until both budgets allow the call; lower priority values are admitted first"""
+        if not self._waiters and self.request_bucket.wait_time() <= 0 and self.token_bucket.wait_time(tokens) <= 0:
+            self._take(tokens)
+            return
+        
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), tokens, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+        self.counters["delayed"] += 1
+        self.counters["wait_seconds"] += time.monotonic() - started
+
+    def _take(self, tokens: int):
+        self.request_bucket.take()
+        self.token_bucket.take(tokens)
+        self.counters["admitted"] += 1
+
+    async def _dispatch(self):
+        while self._waiters:
+            priority, _, tokens, future = self._waiters[0]
+            if future.done():
+                # The caller was cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+            wait = max(self.request_bucket.wait_time(), self.token_bucket.wait_time(tokens))
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            heapq.heappop(self._waiters)
+            self._take(tokens)
+            future.set_result(None)
+
+    async def run(self, call, prompt: str, priority: int = PRIORITY_BULK, slots: Optional[PrioritySemaphore] = None):
+        """Run `call()` once admitted, retrying 429/5xx/connection errors with jittered exponential backoff
+        
+        The concurrency slot is taken per attempt after admission, in priority order, and is not held
+        through backoff sleeps.
+        """
+        estimated = estimate_tokens(prompt) + self.expected_completion_tokens
+        for attempt in range(self.max_retries + 1):
+            await self.admit(estimated, priority)
+            self.counters["estimated_tokens"] += estimated
+            try:
+                async with (slots.acquire(priority) if slots is not None else nullcontext()):
+                    response = await call()
+            except Exception as e:
+                # A rejected or failed call did not spend its completion budget
+                self.token_bucket.adjust(-estimated)
+                retryable, retry_after = retryable_llm_error(e)
+                if not retryable or attempt == self.max_retries:
+                    self.counters["failures"] += 1
+                    raise
+                if getattr(e, "status_code", None) == 429:
+                    self.counters["rate_limited"] += 1
+                self.counters["retries"] += 1
+                delay = retry_after or random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                print(f"LLM call failed ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            
+            # Settle the token budget with what the call actually used
+            actual = completion_tokens_used(response)
+            if actual:
+                self.counters["actual_tokens"] += actual
+                self.token_bucket.adjust(actual - estimated)
+            return response
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "wait_seconds": round(self.counters["wait_seconds"], 3),
+            "queued": sum(1 for *_, future in self._waiters if not future.done()),
+            "requests_available": round(self.request_bucket.tokens, 1),
+            "tokens_available": round(self.token_bucket.tokens)
+        }
+
+@dataclass
+class PoolStats:
+    requests: int = 0
+    connections_created: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        reused = max(self.requests - self.connections_created, 0)
+        return {
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": reused,
+            "reuse_rate": round(reused / self.requests, 3) if self.requests else 0.0
+        }
+
+class HttpClientPool:
+    """Long-lived HTTP clients for page scraping (aiohttp) and Serper search (httpx)"""
+
+    def __init__(
+        self,
+        pool_size: int = HTTP_POOL_SIZE,
+        per_host: int = HTTP_POOL_PER_HOST,
+        keepalive: float = HTTP_KEEPALIVE_SECONDS,
+        dns_cache_ttl: int = HTTP_DNS_CACHE_SECONDS,
+        search_pool_size: int = SERPER_POOL_SIZE,
+        scrape_timeout: float = SCRAPE_TIMEOUT_SECONDS
+    ):
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self.keepalive = keepalive
+        self.dns_cache_ttl = dns_cache_ttl
+        self.search_pool_size = search_pool_size
+        self.scrape_timeout = scrape_timeout
+        self.scrape_stats = PoolStats()
+        self.search_stats = PoolStats()
+        self.scrape_session: Optional["aiohttp.ClientSession"] = None
+        self.search_client: Optional["httpx.AsyncClient"] = None
+        self._open_lock = asyncio.Lock()
+
+    async def ensure_open(self):
+        """Open the pools on first use; concurrent callers share one opening"""
+        async with self._open_lock:
+            if self.scrape_session is None:
+                await self.open()
+
+    async def open(self):
+        """Create the pooled clients; must run inside the serving event loop"""
+        import aiohttp
+        import httpx
+        
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._on_scrape_request)
+        trace_config.on_connection_create_end.append(self._on_scrape_connection)
+        
+        self.scrape_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive
+            ),
+            timeout=aiohttp.ClientTimeout(total=self.scrape_timeout),
+            headers={'User-Agent': SCRAPE_USER_AGENT},
+            trace_configs=[trace_config]
+        )
+        self.search_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.search_pool_size,
+                max_keepalive_connections=self.search_pool_size,
+                keepalive_expiry=self.keepalive
+            ),
+            event_hooks={"request": [self._on_search_request]}
+        )
+
+    async def close(self):
+        if self.scrape_session is not None:
+            await self.scrape_session.close()
+            self.scrape_session = None
+        if self.search_client is not None:
+            await self.search_client.aclose()
+            self.search_client = None
+
+    async def _on_scrape_request(self, session, context, params):
+        self.scrape_stats.requests += 1
+
+    async def _on_scrape_connection(self, session, context, params):
+        self.scrape_stats.connections_created += 1
+
+    async def _on_search_request(self, request: "httpx.Request"):
+        self.search_stats.requests += 1
+        request.extensions["trace"] = self._trace_search
+
+    async def _trace_search(self, event_name: str, info: Dict[str, Any]):
+        if event_name == "connection.connect_tcp.complete":
+            self.search_stats.connections_created += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "scrape": {
+                **self.scrape_stats.to_dict(),
+                "pool_size": self.pool_size,
+                "per_host": self.per_host
+            },
+            "search": {
+                **self.search_stats.to_dict(),
+                "pool_size": self.search_pool_size
+            }
+        }
+
+
+# Metrics for /metrics (Prometheus text format) and per-request timing breakdowns
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+HAS_OPENTELEMETRY = importlib.util.find_spec("opentelemetry") is not None
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(label_names: Tuple[str, ...], values: Tuple[str, ...], extra: Tuple[str, ...] = ()) -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(label_names, values)]
+    pairs.extend(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+    
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (), buckets: Tuple[float, ...] = METRIC_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # label values -> [bucket counts..., sum, count]
+        self.series: Dict[Tuple[str, ...], List[float]] = {}
+    
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0] * len(self.buckets) + [0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.series.items()):
+            bounds = [f'le="{bound}"' for bound in self.buckets] + ['le="+Inf"']
+            for bound, count in zip(bounds, series[:len(self.buckets)] + [series[-1]]):
+                lines.append(f"{self.name}_bucket{format_labels(self.label_names, key, (bound,))} {count}")
+            lines.append(f"{self.name}_sum{format_labels(self.label_names, key)} {series[-2]}")
+            lines.append(f"{self.name}_count{format_labels(self.label_names, key)} {series[-1]}")
+        return lines
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+    
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.series: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        self.series[key] = self.series.get(key, 0) + amount
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.series.items()):
+            lines.append(f"{self.name}{format_labels(self.label_names, key)} {value}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: List[Any] = []
+    
+    def histogram(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> Histogram:
+        metric = Histogram(name, help_text, label_names)
+        self.metrics.append(metric)
+        return metric
+    
+    def counter(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, label_names)
+        self.metrics.append(metric)
+        return metric
+    
+    def render(self) -> str:
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+METRICS = MetricsRegistry()
+SEARCH_SECONDS = METRICS.histogram("curriculum_search_duration_seconds", "Serper search latency (cache misses)")
+SCRAPE_SECONDS = METRICS.histogram("curriculum_scrape_duration_seconds", "Page download: host/slot wait (wait), network I/O (network) and text extraction (parse)", ("phase",))
+LLM_SECONDS = METRICS.histogram("curriculum_llm_duration_seconds", "Groq completion latency including scheduler wait and retries", ("kind",))
+LLM_TOKENS = METRICS.counter("curriculum_llm_tokens_total", "Tokens used by Groq completions", ("kind", "type"))
+NODE_SECONDS = METRICS.histogram("curriculum_node_duration_seconds", "Curriculum pipeline stage latency", ("node",))
+REQUEST_SECONDS = METRICS.histogram("curriculum_request_duration_seconds", "End-to-end curriculum generation latency", ("endpoint",))
+
+class RequestTimings:
+    """Span durations and LLM tokens of one curriculum request, summed per span name"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: Dict[str, Dict[str, float]] = {}
+        self.tokens: Dict[str, int] = {"prompt": 0, "completion": 0}
+    
+    def add(self, name: str, seconds: float):
+        entry = self.spans.setdefault(name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+        entry["count"] += 1
+        entry["total_seconds"] += seconds
+        entry["max_seconds"] = max(entry["max_seconds"], seconds)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        # Spans overlap (subtopics run concurrently), so totals can exceed the wall time
+        return {
+            "wall_seconds": round(time.perf_counter() - self.started, 4),
+            "spans": {
+                name: {key: round(value, 4) for key, value in entry.items()}
+                for name, entry in sorted(self.spans.items(), key=lambda item: -item[1]["total_seconds"])
+            },
+            "llm_tokens": dict(self.tokens)
+        }
+
+# Set for the duration of a request; tasks started by the request inherit it
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("current_timings", default=None)
+
+def record_span(histogram: Histogram, name: str, seconds: float, **labels: str):
+    """Add a finished span to its histogram and the current request's timings"""
+    histogram.observe(seconds, **labels)
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add(":".join([name, *labels.values()]), seconds)
+
+@contextmanager
+def span(histogram: Histogram, name: str, **labels: str):
+    """Time a block into a histogram and the request timings, and trace it when OpenTelemetry is installed"""
+    if HAS_OPENTELEMETRY:
+        from opentelemetry import trace
+        trace_span = trace.get_tracer("curriculum").start_as_current_span(name, attributes=labels)
+    else:
+        trace_span = nullcontext()
+    started = time.perf_counter()
+    with trace_span:
+        try:
+            yield
+        finally:
+            record_span(histogram, name, time.perf_counter() - started, **labels)
+
+def record_llm_tokens(kind: str, prompt: str, response: Any):
+    """Count a completion's prompt and completion tokens, estimating the prompt when usage is missing"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    prompt_tokens = usage.get("input_tokens") or estimate_tokens(prompt)
+    completion_tokens = usage.get("output_tokens") or 0
+    LLM_TOKENS.inc(prompt_tokens, kind=kind, type="prompt")
+    LLM_TOKENS.inc(completion_tokens, kind=kind, type="completion")
+    timings = current_timings.get()
+    if timings is not None:
+        timings.tokens["prompt"] += prompt_tokens
+        timings.tokens["completion"] += completion_tokens
+
+def traced_node(name: str, node):
+    """Wrap a LangGraph node so its duration lands in the node histogram"""
+    async def run(state: CurriculumState) -> CurriculumState:
+        with span(NODE_SECONDS, "node", node=name):
+            return await node(state)
+    return run
+
+def emit_event(event: Dict[str, Any]):
+    """Send a progress event to a streamed workflow run; dropped under ainvoke or when a node is called directly"""
+    from langgraph.config import get_stream_writer
+    
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return
+    writer(event)
+
+
+# Batched generation answers with one "=== SUBTOPIC n ===" section per subtopic
+BATCH_ITEM_PATTERN = re.compile(r'=== SUBTOPIC (\d+) ===(.*?)(?=\n\s*=== SUBTOPIC \d+ ===|\Z)', re.DOTALL)
+
 
 @dataclass
 class CurriculumAgent:
-    groq_client: ChatGroq
+    groq_client: Optional["ChatGroq"]
     serper_api_key: str
+    http: Optional[HttpClientPool] = None
+    page_cache: Optional[PageCache] = None
+    search_cache: Optional[TieredCache] = None
+    completion_cache: Optional[CompletionCache] = None
+    artifact_store: Optional[ArtifactStore] = None
+    extract_pool: Optional[Executor] = None
+    max_download_bytes: int = SCRAPE_MAX_BYTES
+    hosts: HostScheduler = field(default_factory=HostScheduler)
+    llm_scheduler: LLMScheduler = field(default_factory=LLMScheduler)
+    hedged_scraping: bool = SCRAPE_HEDGING
+    hedge_candidates: int = SCRAPE_HEDGE_CANDIDATES
+    scrape_sources_wanted: int = SCRAPE_SOURCES
+    scrape_deadline: float = SCRAPE_DEADLINE_SECONDS
+    hedge_counters: Dict[str, int] = field(default_factory=lambda: {
+        "scrape_rounds": 0, "candidates": 0, "stragglers_cancelled": 0, "deadline_hits": 0, "saturated_stops": 0
+    })
+    download_counters: Dict[str, int] = field(default_factory=lambda: {
+        "pages": 0, "bytes_downloaded": 0, "truncated": 0,
+        "rejected_content_type": 0, "rejected_too_large": 0
+    })
+    batched_generation: bool = GENERATION_MODE == "batched"
+    batch_size: int = LLM_BATCH_SIZE
+    batch_counters: Dict[str, int] = field(default_factory=lambda: {
+        "batches": 0, "items": 0, "regenerated_notes": 0, "regenerated_quizzes": 0
+    })
+    llm_calls: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    dedup_counters: Dict[str, int] = field(default_factory=dict)
+    prefetch_enabled: bool = PREFETCH_SOURCES
+    prefetch_buffer: int = PREFETCH_BUFFER
+    prefetch_counters: Dict[str, int] = field(default_factory=dict)
+    max_concurrent_subtopics: int = MAX_CONCURRENT_SUBTOPICS
+    max_concurrent_searches: int = MAX_CONCURRENT_SEARCHES
+    max_concurrent_scrapes: int = MAX_CONCURRENT_SCRAPES
+    max_concurrent_llm_calls: int = MAX_CONCURRENT_LLM_CALLS
+    _subtopic_slots: asyncio.Semaphore = field(init=False, repr=False)
+    _search_slots: asyncio.Semaphore = field(init=False, repr=False)
+    _scrape_slots: asyncio.Semaphore = field(init=False, repr=False)
+    _llm_slots: PrioritySemaphore = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # Limits are shared by every curriculum served by this agent
+        self._subtopic_slots = asyncio.Semaphore(self.max_concurrent_subtopics)
+        self._search_slots = asyncio.Semaphore(self.max_concurrent_searches)
+        self._scrape_slots = asyncio.Semaphore(self.max_concurrent_scrapes)
+        self._llm_slots = PrioritySemaphore(self.max_concurrent_llm_calls)
     
+    async def get_http(self) -> HttpClientPool:
+        """Return the injected connection pools, opening private ones if none were provided"""
+        if self.http is None:
+            self.http = HttpClientPool()
+        if self.http.scrape_session is None:
+            await self.http.ensure_open()
+        return self.http
+
     async def scrape_content(self, url: str) -> str:
         """Scrape and extract meaningful content from URL"""
+        cached = await run_storage(self.page_cache, self.page_cache.get, url) if self.page_cache is not None else None
+        if cached is not None and cached.fresh:
+            return cached.content
+        
+        # Expired entries are revalidated with a conditional request
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+        
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                }
-                async with session.get(url, headers=headers) as response:
-                    if response.status != 200:
-                        return ""
-                    
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'html.parser')
-                    
-                    # Remove script and style elements
-                    for script in soup(["script", "style", "nav", "header", "footer", "aside"]):
-                        script.extract()
-                    
-                    # Extract main content
-                    content_selectors = [
-                        'main', 'article', '.content', '.post-content', 
-                        '.entry-content', '.article-content', '#content',
-                        '.tutorial-content', '.lesson-content'
-                    ]
-                    
-                    content_text = ""
-                    for selector in content_selectors:
-                        content_div = soup.select_one(selector)
-                        if content_div:
-                            content_text = content_div.get_text(separator='\n', strip=True)
-                            break
-                    
-                    if not content_text:
-                        # Fallback to body content
-                        content_text = soup.get_text(separator='\n', strip=True)
-                    
-                    # Clean and limit content
-                    lines = [line.strip() for line in content_text.split('\n') if line.strip()]
-                    # Take first 100 lines or 3000 characters, whichever is smaller
-                    content_text = '\n'.join(lines[:100])
-                    return content_text[:3000] if len(content_text) > 3000 else content_text
+            http = await self.get_http()
+            
+            # Domains that keep failing are skipped until their circuit breaker lets a probe through
+            host = self.hosts.get(url)
+            if not host.allow_request():
+                return cached.content if cached is not None else ""
+            
+            waiting = time.perf_counter()
+            async with host.request() as outcome:
+                if not outcome.allowed:
+                    return cached.content if cached is not None else ""
+                # The global slot is taken once the host's own slot and rate token are held,
+                # so a throttled domain never blocks scrapes of other hosts
+                async with self._scrape_slots:
+                    # Self-imposed politeness and concurrency waits are kept out of network time
+                    record_span(SCRAPE_SECONDS, "scrape", time.perf_counter() - waiting, phase="wait")
+                    with span(SCRAPE_SECONDS, "scrape", phase="network"):
+                        async with http.scrape_session.get(url, headers=headers) as response:
+                            outcome.status = response.status
+                            if response.status == 304 and cached is not None:
+                                await run_storage(self.page_cache, self.page_cache.revalidated, url)
+                                return cached.content
+                            
+                            if response.status != 200:
+                                return ""
+                            
+                            # Skip PDFs, videos and oversized pages before downloading them
+                            if response.headers.get('Content-Type') and response.content_type not in SCRAPE_CONTENT_TYPES:
+                                self.download_counters["rejected_content_type"] += 1
+                                return ""
+                            if response.content_length is not None and response.content_length > SCRAPE_MAX_CONTENT_LENGTH:
+                                self.download_counters["rejected_too_large"] += 1
+                                return ""
+                            
+                            html = await self.read_capped_text(response)
+                            etag = response.headers.get('ETag')
+                            last_modified = response.headers.get('Last-Modified')
+            
+            # The connection is back in the pool while the page is parsed
+            with span(SCRAPE_SECONDS, "scrape", phase="parse"):
+                content_text = await self.extract_text(html)
+            
+            if content_text and self.page_cache is not None:
+                await run_storage(self.page_cache, self.page_cache.put, url, content_text, etag=etag, last_modified=last_modified)
+            return content_text
                     
         except Exception as e:
             print(f"Error scraping {url}: {e}")
             return ""
 
-    async def search_content(self, query: str) -> List[Dict[str, str]]:
+    async def read_capped_text(self, response: "aiohttp.ClientResponse") -> str:
+        """Stream and incrementally decode a response body, stopping at the download byte budget"""
+        try:
+            decoder = codecs.getincrementaldecoder(response.charset or 'utf-8')(errors='replace')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        
+        parts = []
+        received = 0
+        async for chunk in response.content.iter_chunked(SCRAPE_CHUNK_BYTES):
+            remaining = self.max_download_bytes - received
+            if len(chunk) >= remaining:
+                parts.append(decoder.decode(chunk[:remaining], final=True))
+                received += remaining
+                self.download_counters["truncated"] += 1
+                break
+            parts.append(decoder.decode(chunk))
+            received += len(chunk)
+        else:
+            parts.append(decoder.decode(b'', final=True))
+        
+        self.download_counters["pages"] += 1
+        self.download_counters["bytes_downloaded"] += received
+        return ''.join(parts)
+
+    async def extract_text(self, html: str) -> str:
+        """Parse HTML off the event loop, in the extraction process pool when one is configured"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.extract_pool, extract_page_text, html)
+
+    async def search_content(self, query: str, max_results: int = 3) -> List[Dict[str, str]]:
         """Search for educational content URLs using Serper API and return with titles"""
-        url = "https://google.serper.dev/search"
+        url = SERPER_URL
         headers = {
             "X-API-KEY": self.serper_api_key,
             "Content-Type": "application/json"
@@ -114,10 +2044,21 @@ class CurriculumAgent:
             "gl": "us",
             "hl": "en"
         }
+        # Same query in any casing/spacing with the same parameters shares one entry
+        cache_key = json.dumps(
+            {**payload, "q": normalize_text(payload["q"]), "max_results": max_results},
+            sort_keys=True
+        )
+        if self.search_cache is not None:
+            cached = await run_storage(self.search_cache, self.search_cache.get, cache_key)
+            if cached is not None:
+                return [dict(url_data) for url_data in cached]
         
-        async with httpx.AsyncClient() as client:
+        async with self._search_slots:
             try:
-                response = await client.post(url, json=payload, headers=headers)
+                http = await self.get_http()
+                with span(SEARCH_SECONDS, "search"):
+                    response = await http.search_client.post(url, json=payload, headers=headers)
                 if response.status_code != 200:
                     return []
                 
@@ -133,7 +2074,7 @@ class CurriculumAgent:
                 ]
                 
                 for result in data.get("organic", []):
-                    if len(urls_data) >= 3:  # Limit to 3 for scraping
+                    if len(urls_data) >= max_results:
                         break
                         
                     link = result.get("link")
@@ -146,40 +2087,169 @@ class CurriculumAgent:
                             "snippet": result.get("snippet", "")
                         })
                 
+                if self.search_cache is not None:
+                    await run_storage(self.search_cache, self.search_cache.set, cache_key, urls_data, size=len(json.dumps(urls_data)))
                 return urls_data
                 
             except Exception as e:
                 print(f"Serper API error: {e}")
                 return []
 
+    async def invoke_llm(self, prompt: str, bypass_cache: bool = False, cache_ttl: Optional[float] = None, priority: int = PRIORITY_BULK, kind: str = "other") -> str:
+        """Run a Groq completion without blocking the event loop, serving repeats from the completion cache"""
+        cache = self.completion_cache
+        cache_key = cache.key(self.groq_client, prompt) if cache is not None else None
+        if cache is not None:
+            if bypass_cache:
+                cache.counters["bypassed"] += 1
+            else:
+                cached = await run_storage(cache, cache.get, cache_key)
+                if cached is not None:
+                    return cached
+        
+        usage = self.llm_calls.setdefault(kind, {"calls": 0, "prompt_tokens": 0})
+        usage["calls"] += 1
+        usage["prompt_tokens"] += estimate_tokens(prompt)
+        with span(LLM_SECONDS, "llm", kind=kind):
+            response = await self.llm_scheduler.run(
+                lambda: self.groq_client.ainvoke(prompt), prompt, priority, slots=self._llm_slots
+            )
+        record_llm_tokens(kind, prompt, response)
+        
+        if cache is not None:
+            await run_storage(cache, cache.put, cache_key, response.content, tokens=completion_tokens_used(response), ttl=cache_ttl)
+        return response.content
+
     def clean_json_response(self, response_text: str) -> str:
         """Clean and extract JSON from LLM response"""
         response_text = re.sub(r'```json\n?', '', response_text)
         response_text = re.sub(r'```\n?', '', response_text)
         
-        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-        if json_match:
-            return json_match.group(0)
+        # Whichever bracket opens first decides: a quiz array of objects must not collapse to "{...}, {...}"
+        object_start = response_text.find('{')
+        array_start = response_text.find('[')
+        patterns = [r'\{.*\}', r'\[.*\]']
+        if array_start != -1 and (object_start == -1 or array_start < object_start):
+            patterns.reverse()
         
-        array_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-        if array_match:
-            return array_match.group(0)
+        for pattern in patterns:
+            match = re.search(pattern, response_text, re.DOTALL)
+            if match:
+                return match.group(0)
             
         return response_text.strip()
 
-    def generate_course_outline(self, state: CurriculumState) -> CurriculumState:
+    def parse_quiz_items(self, response_text: str) -> Optional[List[Dict[str, Any]]]:
+        """Parse a quiz JSON array, returning None unless it holds well-formed questions"""
+        try:
+            quiz = json.loads(self.clean_json_response(response_text))
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(quiz, list):
+            return None
+        quiz = [item for item in quiz if isinstance(item, dict) and item.get("question") and isinstance(item.get("options"), list)]
+        return quiz[:8] or None
+
+    def build_batch_prompt(self, subject: str, main_topic: str, subtopics: List[str], sources: List[Tuple[List[str], List[str]]]) -> str:
+        """One prompt asking for notes and quiz of several sibling subtopics in a delimited layout"""
+        if self.is_math_or_logical_subject(subject):
+            note_sections = (
+                "Definition and Core Concepts, Mathematical Formulas/Equations (use LaTeX notation like $x^2 + y^2 = z^2$), "
+                "Step-by-step Examples with calculations, Diagrams Description, Key Properties and Rules, "
+                "Common Applications, Important Theorems/Principles, Practice Problems (2-3 with solutions)"
+            )
+            quiz_style = "numerical problems, logical reasoning and practical applications with actual calculations"
+        else:
+            note_sections = (
+                "Introduction and Overview, Key Concepts and Definitions, Detailed Explanations, "
+                "Diagrams and Visual Aids Description, Real-world Examples, Important Points to Remember, "
+                "Practical Applications, Common Misconceptions"
+            )
+            quiz_style = "comprehensive questions testing understanding of the notes"
+        
+        blocks = []
+        for number, (subtopic, (scraped_contents, _)) in enumerate(zip(subtopics, sources), start=1):
+            source_text = rank_source_text(subject, main_topic, subtopic, scraped_contents)
+            blocks.append(
+                f"Subtopic {number}: {subtopic}\n"
+                f"Source materials:\n{source_text or 'None available, rely on your own knowledge.'}"
+            )
+        subtopic_blocks = "\n\n".join(blocks)
+        
+        return f"""
+        Create study material for {len(subtopics)} subtopics of '{main_topic}' in {subject}.
+        
+        {subtopic_blocks}
+        
+        For EACH subtopic produce:
+        1. Comprehensive study notes in markdown (headers, bullet points, emphasis) covering: {note_sections}
+        2. A quiz of 8 multiple-choice questions ({quiz_style}) based on those notes
+        
+        Use EXACTLY this layout for every subtopic, numbered in the order given above:
+        === SUBTOPIC 1 ===
+        --- NOTES ---
+        (markdown notes)
+        --- QUIZ ---
+        [
+            {{
+                "question": "Specific question",
+                "options": ["Option A", "Option B", "Option C", "Option D"],
+                "correct_answer": 0,
+                "explanation": "Why this answer is correct"
+            }}
+        ]
+        === END ===
+        """
+
+    def parse_batch_response(self, response_text: str, count: int) -> List[Tuple[Optional[str], Optional[List[Dict[str, Any]]]]]:
+        """Split a batched response into (notes, quiz) per subtopic; unusable parts come back as None"""
+        items: List[Tuple[Optional[str], Optional[List[Dict[str, Any]]]]] = [(None, None)] * count
+        for match in BATCH_ITEM_PATTERN.finditer(response_text):
+            index = int(match.group(1)) - 1
+            if not 0 <= index < count:
+                continue
+            body = match.group(2).replace('=== END ===', '')
+            notes_part, _, quiz_part = body.partition('--- QUIZ ---')
+            notes = notes_part.split('--- NOTES ---', 1)[-1].strip()
+            items[index] = (notes or None, self.parse_quiz_items(quiz_part) if quiz_part else None)
+        return items
+
+    async def generate_course_outline(self, state: CurriculumState) -> CurriculumState:
         """Generate subtopics for each main topic"""
+        if state.get('run') is None:
+            state['run'] = CurriculumRun(totals=self.dedup_counters)
         
+        bypass_cache = state.get('bypass_cache', False)
+        if state.get('base_curriculum') is None:
+            state['course_outline'] = await self.outline_topics(state['subject'], state['topics'], bypass_cache)
+        else:
+            state['course_outline'] = await self.extend_course_outline(state['subject'], state['topics'], state['base_curriculum'], bypass_cache)
+            # Fresh content was asked for: every subtopic is generated again, like the completion and result caches
+            if not bypass_cache:
+                state['reused'] = await run_storage(self.artifact_store, self.reuse_artifacts, state['subject'], state['course_outline'])
+        
+        course_outline = state['course_outline']
+        emit_event({
+            "type": "outline",
+            "course_title": course_outline['course_title'],
+            "overview": course_outline['overview'],
+            "main_topics": course_outline['main_topics'],
+            "total_subtopics": sum(len(topic['subtopics']) for topic in course_outline['main_topics'])
+        })
+        return state
+
+    async def outline_topics(self, subject: str, topics: List[str], bypass_cache: bool = False) -> Dict[str, Any]:
+        """Ask the LLM for the course title, overview and subtopics of the given main topics"""
         prompt = f"""
-        Create comprehensive subtopics for each main topic in {state['subject']}.
-        Main topics: {', '.join(state['topics'])}
+        Create comprehensive subtopics for each main topic in {subject}.
+        Main topics: {', '.join(topics)}
         
         For each main topic, generate 3-5 relevant subtopics that cover all important aspects.
         
         Return ONLY this JSON structure:
         {{
-            "course_title": "Complete {state['subject']} Course",
-            "overview": "Comprehensive course covering all aspects of {state['subject']} with detailed subtopics",
+            "course_title": "Complete {subject} Course",
+            "overview": "Comprehensive course covering all aspects of {subject} with detailed subtopics",
             "main_topics": [
                 {{
                     "topic": "Topic 1 name",
@@ -195,32 +2265,72 @@ class CurriculumAgent:
         Make subtopics specific and comprehensive.
         """
         
-        response = self.groq_client.invoke(prompt)
-        cleaned_response = self.clean_json_response(response.content)
+        response = await self.invoke_llm(prompt, bypass_cache=bypass_cache, priority=PRIORITY_CRITICAL, kind="outline")
+        cleaned_response = self.clean_json_response(response)
         
         try:
             course_outline = json.loads(cleaned_response)
         except json.JSONDecodeError as e:
             print(f"JSON parsing error: {e}")
             course_outline = {
-                "course_title": f"Complete {state['subject']} Course",
-                "overview": f"Comprehensive course covering all aspects of {state['subject']} with detailed coverage of each topic.",
-                "main_topics": []
+                "course_title": f"Complete {subject} Course",
+                "overview": f"Comprehensive course covering all aspects of {subject} with detailed coverage of each topic.",
+                "main_topics": [{"topic": topic, "subtopics": default_subtopics(topic)} for topic in topics]
             }
-            
-            for topic in state['topics']:
-                course_outline["main_topics"].append({
-                    "topic": topic,
-                    "subtopics": [
-                        f"Introduction to {topic}",
-                        f"Core Concepts of {topic}",
-                        f"Practical Applications of {topic}",
-                        f"Advanced {topic} Techniques"
-                    ]
-                })
         
-        state['course_outline'] = course_outline
-        return state
+        return course_outline
+
+    async def extend_course_outline(self, subject: str, topics: List[str], base_curriculum: Dict[str, Any], bypass_cache: bool = False) -> Dict[str, Any]:
+        """Outline for an edited topic list: topics kept from the saved curriculum keep their subtopics, only new ones go to the LLM"""
+        known = {normalize_text(entry['request_topic']): entry for entry in base_curriculum['main_topics']}
+        new_topics = [topic for topic in topics if normalize_text(topic) not in known]
+        if new_topics:
+            outline = await self.outline_topics(subject, new_topics, bypass_cache)
+            for entry in outline_entries(new_topics, outline['main_topics']):
+                known[normalize_text(entry['request_topic'])] = entry
+        
+        main_topics = []
+        for topic in topics:
+            entry = known.get(normalize_text(topic)) or {"topic": topic, "subtopics": default_subtopics(topic)}
+            main_topics.append({"topic": entry['topic'], "subtopics": entry['subtopics']})
+        return {
+            "course_title": base_curriculum['course_title'],
+            "overview": base_curriculum['overview'],
+            "main_topics": main_topics
+        }
+
+    def reuse_artifacts(self, subject: str, course_outline: Dict[str, Any]) -> Dict[Tuple[int, int], Dict[str, Any]]:
+        """Stored content for the outline's subtopics by (topic index, subtopic index); the rest still has to be generated"""
+        reused = {}
+        if self.artifact_store is None:
+            return reused
+        for topic_index, main_topic_data in enumerate(course_outline['main_topics']):
+            for subtopic_index, subtopic in enumerate(main_topic_data['subtopics']):
+                artifact = self.artifact_store.get(subject, main_topic_data['topic'], subtopic)
+                if artifact is not None:
+                    reused[(topic_index, subtopic_index)] = {**artifact, "subtopic": subtopic}
+        return reused
+
+    async def save_curriculum(self, state: CurriculumState, final_quiz: List[Dict[str, Any]]) -> Optional[str]:
+        """Save the outline and final quiz so the curriculum can be regenerated from its id; None when the store is off"""
+        if self.artifact_store is None:
+            return None
+        course_outline = state['course_outline']
+        artifacts = state.get('artifacts') or {}
+        main_topics = outline_entries(state['topics'], course_outline['main_topics'])
+        for topic_index, entry in enumerate(main_topics):
+            stored = [artifacts.get((topic_index, subtopic_index), (None, None)) for subtopic_index in range(len(entry['subtopics']))]
+            entry['artifact_ids'] = [artifact_id for artifact_id, _ in stored]
+            entry['subtopic_sizes'] = [size for _, size in stored]
+        return await run_storage(self.artifact_store, self.artifact_store.save_curriculum, {
+            "subject": state['subject'],
+            "topics": state['topics'],
+            "course_title": course_outline['course_title'],
+            "overview": course_outline['overview'],
+            "main_topics": main_topics,
+            "final_quiz": final_quiz,
+            "created_at": time.time()
+        })
 
     def is_math_or_logical_subject(self, subject: str) -> bool:
         """Check if subject requires numerical/logical questions"""
@@ -232,19 +2342,80 @@ class CurriculumAgent:
         ]
         return any(keyword in subject.lower() for keyword in math_subjects)
 
-    async def generate_comprehensive_notes(self, subject: str, main_topic: str, subtopic: str, scraped_contents: List[str]) -> str:
+    async def scrape_sources(self, urls_data: List[Dict[str, str]], wanted: int, deadline: Optional[float] = None, ranker: Optional[SourceRanker] = None, run: Optional[CurriculumRun] = None) -> List[Tuple[Dict[str, str], str]]:
+        """Scrape candidates in parallel and return up to `wanted` non-empty pages in search ranking order
+        
+        Scraping stops as soon as enough pages arrived, the deadline passed or the ranker holds enough
+        relevant text; stragglers are cancelled. With a run, downloads are shared with the other
+        subtopics and near-duplicate pages do not count as sources.
+        """
+        tasks = {
+            asyncio.ensure_future(
+                run.scrape(url_data['url'], self.scrape_content) if run is not None else self.scrape_content(url_data['url'])
+            ): rank
+            for rank, url_data in enumerate(urls_data)
+        }
+        accepted: Dict[int, str] = {}
+        repeats: Dict[int, str] = {}
+        taken: List[frozenset] = []
+        repeated: List[frozenset] = []
+        pending = set(tasks)
+        loop = asyncio.get_running_loop()
+        expires_at = loop.time() + deadline if deadline is not None else None
+        
+        try:
+            while pending and len(accepted) < wanted:
+                timeout = expires_at - loop.time() if expires_at is not None else None
+                if timeout is not None and timeout <= 0:
+                    self.hedge_counters["deadline_hits"] += 1
+                    break
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    content = task.result()
+                    if not content:
+                        continue
+                    if run is not None:
+                        verdict = run.admit(content, taken, repeated)
+                        if verdict == "duplicate":
+                            continue
+                        if verdict == "repeat":
+                            repeats[tasks[task]] = content
+                            continue
+                    accepted[tasks[task]] = content
+                    if ranker is not None:
+                        ranker.add(content)
+                if ranker is not None and ranker.saturated and pending and len(accepted) < wanted:
+                    self.hedge_counters["saturated_stops"] += 1
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            self.hedge_counters["stragglers_cancelled"] += len(pending)
+        
+        self.hedge_counters["scrape_rounds"] += 1
+        self.hedge_counters["candidates"] += len(urls_data)
+        if repeats:
+            if accepted:
+                run.discard_repeats(list(repeats.values()))
+            else:
+                # Only pages another subtopic already used came back; they still beat no sources
+                accepted = repeats
+        ranks = sorted(accepted)[:wanted]
+        return [(urls_data[rank], accepted[rank]) for rank in ranks]
+
+    async def generate_comprehensive_notes(self, subject: str, main_topic: str, subtopic: str, scraped_contents: List[str], bypass_cache: bool = False) -> str:
         """Generate comprehensive notes with diagrams and equations from scraped content"""
         
         is_logical_subject = self.is_math_or_logical_subject(subject)
         
-        combined_content = "\n\n---CONTENT SEPARATOR---\n\n".join(scraped_contents)
+        source_text = rank_source_text(subject, main_topic, subtopic, scraped_contents)
         
         if is_logical_subject:
             notes_prompt = f"""
             Create comprehensive study notes for '{subtopic}' under '{main_topic}' in {subject}.
             
             Source materials:
-            {combined_content[:2000]}
+            {source_text}
             
             Generate detailed notes including:
             1. **Definition and Core Concepts**
@@ -264,7 +2435,7 @@ class CurriculumAgent:
             Create comprehensive study notes for '{subtopic}' under '{main_topic}' in {subject}.
             
             Source materials:
-            {combined_content[:2000]}
+            {source_text}
             
             Generate detailed notes including:
             1. **Introduction and Overview**
@@ -280,137 +2451,321 @@ class CurriculumAgent:
             Make it comprehensive and educational.
             """
         
-        notes_response = self.groq_client.invoke(notes_prompt)
-        return notes_response.content.strip()
+        notes_response = await self.invoke_llm(notes_prompt, bypass_cache=bypass_cache, kind="notes")
+        return notes_response.strip()
+
+    async def prefetch_sources(self, state: CurriculumState) -> CurriculumState:
+        """Start searching and scraping every subtopic in the background so generation can consume them as they arrive"""
+        state['prefetch'] = None
+        if not self.prefetch_enabled:
+            return state
+        
+        subject = state['subject']
+        run = state.get('run')
+        reused = state.get('reused') or {}
+        main_topics = state['course_outline']['main_topics']
+        
+        def fetch(key: Tuple[int, int]):
+            topic_index, subtopic_index = key
+            main_topic_data = main_topics[topic_index]
+            return self.gather_subtopic_sources(subject, main_topic_data['topic'], main_topic_data['subtopics'][subtopic_index], run)
+        
+        keys = [
+            (topic_index, subtopic_index)
+            for topic_index, main_topic_data in enumerate(main_topics)
+            for subtopic_index in range(len(main_topic_data['subtopics']))
+            if (topic_index, subtopic_index) not in reused
+        ]
+        # A batch claims all of its subtopics before generating, so the buffer must hold one whole batch
+        capacity = max(self.prefetch_buffer, self.batch_size if self.batched_generation else 1)
+        state['prefetch'] = SourcePrefetcher(keys, fetch, capacity, totals=self.prefetch_counters)
+        state['prefetch'].start()
+        if run is not None:
+            # Closed with the run even if content generation never starts
+            run.cleanups.append(state['prefetch'].close)
+        return state
 
     async def generate_detailed_content(self, state: CurriculumState) -> CurriculumState:
         """Generate detailed content for each subtopic with web scraping"""
-        detailed_content = []
-        is_logical_subject = self.is_math_or_logical_subject(state['subject'])
+        main_topics = state['course_outline']['main_topics']
         
-        for main_topic_data in state['course_outline']['main_topics']:
-            main_topic = main_topic_data['topic']
-            subtopics_content = []
-            
-            for subtopic in main_topic_data['subtopics']:
-                print(f"Processing subtopic: {subtopic}")
-                
-                # Search for URLs and scrape content
-                search_query = f"{state['subject']} {main_topic} {subtopic}"
-                urls_data = await self.search_content(search_query)
-                
-                # Scrape content from URLs
-                scraped_contents = []
-                learning_urls = []
-                
-                for url_data in urls_data:
-                    content = await self.scrape_content(url_data['url'])
-                    if content:
-                        scraped_contents.append(content)
-                        learning_urls.append(url_data['url'])
-                
-                # Generate comprehensive notes from scraped content
-                if scraped_contents:
-                    comprehensive_notes = await self.generate_comprehensive_notes(
-                        state['subject'], main_topic, subtopic, scraped_contents
-                    )
-                else:
-                    # Fallback explanation if no content scraped
-                    explanation_prompt = f"""
-                    Write comprehensive study notes for '{subtopic}' under '{main_topic}' in {state['subject']}.
-                    
-                    Include:
-                    - Detailed explanation (4-6 sentences)
-                    - Key concepts and definitions
-                    - Practical examples
-                    - Important formulas (if applicable)
-                    
-                    Use markdown formatting.
-                    """
-                    
-                    explanation_response = self.groq_client.invoke(explanation_prompt)
-                    comprehensive_notes = explanation_response.content.strip()
-                
-                # Generate subtopic quiz (7-8 questions)
-                if is_logical_subject:
-                    quiz_prompt = f"""
-                    Create 8 questions for '{subtopic}' in {state['subject']}.
-                    Include numerical problems, logical reasoning, and practical applications.
-                    
-                    Based on this content: {comprehensive_notes[:1000]}
-                    
-                    Return ONLY this JSON array:
-                    [
-                        {{
-                            "question": "Numerical or logical question with specific values/scenarios",
-                            "options": ["Specific answer A", "Specific answer B", "Specific answer C", "Specific answer D"],
-                            "correct_answer": 0,
-                            "explanation": "Brief explanation with calculation steps"
-                        }},
-                        {{
-                            "question": "Another question with actual numbers or formulas",
-                            "options": ["Result 1", "Result 2", "Result 3", "Result 4"],
-                            "correct_answer": 1,
-                            "explanation": "Step-by-step solution"
-                        }}
-                    ]
-                    
-                    Generate 8 such questions with actual calculations and specific scenarios.
-                    """
-                else:
-                    quiz_prompt = f"""
-                    Create 8 comprehensive questions for '{subtopic}' in {state['subject']}.
-                    
-                    Based on this content: {comprehensive_notes[:1000]}
-                    
-                    Return ONLY this JSON array:
-                    [
-                        {{
-                            "question": "Specific question testing understanding of {subtopic}",
-                            "options": ["Detailed option A", "Detailed option B", "Detailed option C", "Detailed option D"],
-                            "correct_answer": 0,
-                            "explanation": "Why this answer is correct"
-                        }}
-                    ]
-                    
-                    Generate 8 questions based on the content provided.
-                    """
-                
-                quiz_response = self.groq_client.invoke(quiz_prompt)
-                cleaned_quiz = self.clean_json_response(quiz_response.content)
-                
-                try:
-                    quiz = json.loads(cleaned_quiz)
-                    if not isinstance(quiz, list):
-                        raise ValueError("Quiz should be a list")
-                except (json.JSONDecodeError, ValueError) as e:
-                    print(f"Quiz generation error for {subtopic}: {e}")
-                    quiz = [
-                        {
-                            "question": f"What is the main concept behind {subtopic}?",
-                            "options": ["Fundamental principle", "Practical application", "Theoretical framework", "All of the above"],
-                            "correct_answer": 3,
-                            "explanation": f"This covers the comprehensive understanding of {subtopic}"
-                        }
-                    ] * 8
-                
-                subtopic_content = {
-                    "subtopic": subtopic,
-                    "comprehensive_notes": comprehensive_notes,
-                    "learning_urls": learning_urls,
-                    "quiz": quiz[:8]
-                }
-                
-                subtopics_content.append(subtopic_content)
-            
-            detailed_content.append({
-                "main_topic": main_topic,
-                "subtopics": subtopics_content
+        # Subtopics finish in any order; slot them back into outline order
+        detailed_content = [
+            {
+                "main_topic": main_topic_data['topic'],
+                "subtopics": [None] * len(main_topic_data['subtopics'])
+            }
+            for main_topic_data in main_topics
+        ]
+        async for topic_index, subtopic_index, subtopic_content in self.iter_subtopic_content(state):
+            detailed_content[topic_index]['subtopics'][subtopic_index] = subtopic_content
+            emit_event({
+                "type": "subtopic",
+                "topic_index": topic_index,
+                "subtopic_index": subtopic_index,
+                "main_topic": main_topics[topic_index]['topic'],
+                **subtopic_content
             })
         
         state['detailed_content'] = detailed_content
         return state
 
+    async def iter_subtopic_content(self, state: CurriculumState) -> AsyncIterator[Tuple[int, int, Dict[str, Any]]]:
+        """Fan out every subtopic of the outline and yield (topic index, subtopic index, content) as each finishes"""
+        bypass_cache = state.get('bypass_cache', False)
+        run = state.get('run')
+        prefetch = state.get('prefetch')
+        reused = state.get('reused') or {}
+        # Ids and encoded sizes of the artifacts this curriculum is built from go into its saved record
+        artifacts = state['artifacts'] = {}
+        
+        async def store(topic_index: int, subtopic_index: int, main_topic: str, content: Dict[str, Any]):
+            if self.artifact_store is not None:
+                artifacts[(topic_index, subtopic_index)] = await run_storage(
+                    self.artifact_store, self.artifact_store.put, state['subject'], main_topic, content['subtopic'], content
+                )
+        
+        async def indexed(topic_index: int, subtopic_index: int, main_topic: str, subtopic: str):
+            if prefetch is None:
+                content = await self.generate_subtopic_content(
+                    state['subject'], main_topic, subtopic,
+                    bypass_cache=bypass_cache, run=run
+                )
+            else:
+                # Claim outside the subtopic slot: slots only ever go to subtopics whose sources are in
+                async with prefetch.claim((topic_index, subtopic_index)) as sources:
+                    content = await self.generate_subtopic_content(
+                        state['subject'], main_topic, subtopic,
+                        bypass_cache=bypass_cache, run=run, sources=sources
+                    )
+            await store(topic_index, subtopic_index, main_topic, content)
+            return [(topic_index, subtopic_index, content)]
+        
+        async def indexed_batch(topic_index: int, indices: List[int], main_topic: str, subtopics: List[str]):
+            if prefetch is None:
+                contents = await self.generate_subtopic_batch(state['subject'], main_topic, subtopics, bypass_cache=bypass_cache, run=run)
+            else:
+                async with AsyncExitStack() as claims:
+                    sources = [
+                        await claims.enter_async_context(prefetch.claim((topic_index, subtopic_index)))
+                        for subtopic_index in indices
+                    ]
+                    contents = await self.generate_subtopic_batch(
+                        state['subject'], main_topic, subtopics, bypass_cache=bypass_cache, run=run, sources=sources
+                    )
+            for subtopic_index, content in zip(indices, contents):
+                await store(topic_index, subtopic_index, main_topic, content)
+            return list(zip(itertools.repeat(topic_index), indices, contents))
+        
+        tasks = []
+        batch_size = max(1, self.batch_size)
+        for topic_index, main_topic_data in enumerate(state['course_outline']['main_topics']):
+            main_topic = main_topic_data['topic']
+            subtopics = main_topic_data['subtopics']
+            # Subtopics with reused artifacts are neither searched nor generated again
+            pending = [subtopic_index for subtopic_index in range(len(subtopics)) if (topic_index, subtopic_index) not in reused]
+            if self.batched_generation:
+                # Batches only group siblings, so one prompt shares its main topic
+                for first in range(0, len(pending), batch_size):
+                    indices = pending[first:first + batch_size]
+                    batch = [subtopics[subtopic_index] for subtopic_index in indices]
+                    tasks.append(asyncio.ensure_future(indexed_batch(topic_index, indices, main_topic, batch)))
+            else:
+                for subtopic_index in pending:
+                    tasks.append(asyncio.ensure_future(indexed(topic_index, subtopic_index, main_topic, subtopics[subtopic_index])))
+        try:
+            for (topic_index, subtopic_index), content in reused.items():
+                # Content-addressed, so storing an unchanged artifact again only refreshes its expiry
+                await store(topic_index, subtopic_index, state['course_outline']['main_topics'][topic_index]['topic'], content)
+                yield topic_index, subtopic_index, content
+            for next_done in asyncio.as_completed(tasks):
+                for item in await next_done:
+                    yield item
+        finally:
+            # Consumer went away (or a subtopic failed): stop the remaining work
+            for task in tasks:
+                task.cancel()
+            if prefetch is not None:
+                prefetch.close()
+
+    async def generate_subtopic_content(self, subject: str, main_topic: str, subtopic: str, bypass_cache: bool = False, run: Optional[CurriculumRun] = None, sources: Optional[Tuple[List[str], List[str]]] = None) -> Dict[str, Any]:
+        """Search, scrape (unless prefetched sources are given) and generate notes and quiz for a single subtopic"""
+        async with self._subtopic_slots:
+            return await self._generate_subtopic_content(subject, main_topic, subtopic, bypass_cache, run, sources)
+
+    async def _generate_subtopic_content(self, subject: str, main_topic: str, subtopic: str, bypass_cache: bool = False, run: Optional[CurriculumRun] = None, sources: Optional[Tuple[List[str], List[str]]] = None) -> Dict[str, Any]:
+        print(f"Processing subtopic: {subtopic}")
+        
+        if sources is None:
+            sources = await self.gather_subtopic_sources(subject, main_topic, subtopic, run)
+        scraped_contents, learning_urls = sources
+        comprehensive_notes = await self.generate_subtopic_notes(subject, main_topic, subtopic, scraped_contents, bypass_cache)
+        quiz = await self.generate_subtopic_quiz(subject, subtopic, comprehensive_notes, bypass_cache)
+        
+        subtopic_content = {
+            "subtopic": subtopic,
+            "comprehensive_notes": comprehensive_notes,
+            "learning_urls": learning_urls,
+            "quiz": quiz
+        }
+        
+        return subtopic_content
+
+    async def generate_subtopic_batch(self, subject: str, main_topic: str, subtopics: List[str], bypass_cache: bool = False, run: Optional[CurriculumRun] = None, sources: Optional[List[Tuple[List[str], List[str]]]] = None) -> List[Dict[str, Any]]:
+        """Notes and quiz for sibling subtopics from one LLM call, regenerating only the items it got wrong"""
+        async with self._subtopic_slots:
+            print(f"Processing subtopics: {', '.join(subtopics)}")
+            if sources is None:
+                sources = await asyncio.gather(*(
+                    self.gather_subtopic_sources(subject, main_topic, subtopic, run) for subtopic in subtopics
+                ))
+            
+            prompt = self.build_batch_prompt(subject, main_topic, subtopics, sources)
+            response = await self.invoke_llm(prompt, bypass_cache=bypass_cache, kind="batch")
+            items = self.parse_batch_response(response, len(subtopics))
+            self.batch_counters["batches"] += 1
+            self.batch_counters["items"] += len(subtopics)
+            
+            async def complete(subtopic: str, scraped_contents: List[str], notes: Optional[str], quiz: Optional[List[Dict[str, Any]]]):
+                # A bad quiz keeps the batch's notes; bad notes also need a quiz that matches the new notes
+                if notes is None:
+                    self.batch_counters["regenerated_notes"] += 1
+                    notes = await self.generate_subtopic_notes(subject, main_topic, subtopic, scraped_contents, bypass_cache)
+                if quiz is None:
+                    self.batch_counters["regenerated_quizzes"] += 1
+                    quiz = await self.generate_subtopic_quiz(subject, subtopic, notes, bypass_cache)
+                return notes, quiz
+            
+            completed = await asyncio.gather(*(
+                complete(subtopic, scraped_contents, notes, quiz)
+                for subtopic, (scraped_contents, _), (notes, quiz) in zip(subtopics, sources, items)
+            ))
+        
+        return [
+            {
+                "subtopic": subtopic,
+                "comprehensive_notes": notes,
+                "learning_urls": learning_urls,
+                "quiz": quiz
+            }
+            for subtopic, (_, learning_urls), (notes, quiz) in zip(subtopics, sources, completed)
+        ]
+
+    async def gather_subtopic_sources(self, subject: str, main_topic: str, subtopic: str, run: Optional[CurriculumRun] = None) -> Tuple[List[str], List[str]]:
+        """Search and scrape a subtopic's sources, returning (scraped contents, learning URLs)"""
+        # Search for URLs and scrape content
+        search_query = f"{subject} {main_topic} {subtopic}"
+        ranker = SourceRanker(subject, main_topic, subtopic)
+        if self.hedged_scraping:
+            # Over-provision candidates and keep whichever good pages arrive first
+            urls_data = await self.search_content(search_query, max_results=self.hedge_candidates)
+            sources = await self.scrape_sources(urls_data, self.scrape_sources_wanted, self.scrape_deadline, ranker=ranker, run=run)
+        else:
+            urls_data = await self.search_content(search_query)
+            sources = await self.scrape_sources(urls_data, len(urls_data), ranker=ranker, run=run)
+        
+        scraped_contents = [content for _, content in sources]
+        learning_urls = [url_data['url'] for url_data, _ in sources]
+        
+        return scraped_contents, learning_urls
+
+    async def generate_subtopic_notes(self, subject: str, main_topic: str, subtopic: str, scraped_contents: List[str], bypass_cache: bool = False) -> str:
+        """Notes from the scraped sources, or a plain explanation when nothing could be scraped"""
+        # Generate comprehensive notes from scraped content
+        if scraped_contents:
+            comprehensive_notes = await self.generate_comprehensive_notes(
+                subject, main_topic, subtopic, scraped_contents, bypass_cache=bypass_cache
+            )
+        else:
+            # Fallback explanation if no content scraped
+            explanation_prompt = f"""
+            Write comprehensive study notes for '{subtopic}' under '{main_topic}' in {subject}.
+            
+            Include:
+            - Detailed explanation (4-6 sentences)
+            - Key concepts and definitions
+            - Practical examples
+            - Important formulas (if applicable)
+            
+            Use markdown formatting.
+            """
+            
+            explanation_response = await self.invoke_llm(explanation_prompt, bypass_cache=bypass_cache, kind="fallback_notes")
+            comprehensive_notes = explanation_response.strip()
+        
+        return comprehensive_notes
+
+    async def generate_subtopic_quiz(self, subject: str, subtopic: str, comprehensive_notes: str, bypass_cache: bool = False) -> List[Dict[str, Any]]:
+        """Generate the 8-question quiz for a subtopic from its notes"""
+        is_logical_subject = self.is_math_or_logical_subject(subject)
+        
+        # Generate subtopic quiz (7-8 questions)
+        if is_logical_subject:
+            quiz_prompt = f"""
+            Create 8 questions for '{subtopic}' in {subject}.
+            Include numerical problems, logical reasoning, and practical applications.
+            
+            Based on this content: {comprehensive_notes[:1000]}
+            
+            Return ONLY this JSON array:
+            [
+                {{
+                    "question": "Numerical or logical question with specific values/scenarios",
+                    "options": ["Specific answer A", "Specific answer B", "Specific answer C", "Specific answer D"],
+                    "correct_answer": 0,
+                    "explanation": "Brief explanation with calculation steps"
+                }},
+                {{
+                    "question": "Another question with actual numbers or formulas",
+                    "options": ["Result 1", "Result 2", "Result 3", "Result 4"],
+                    "correct_answer": 1,
+                    "explanation": "Step-by-step solution"
+                }}
+            ]
+            
+            Generate 8 such questions with actual calculations and specific scenarios.
+            """
+        else:
+            quiz_prompt = f"""
+            Create 8 comprehensive questions for '{subtopic}' in {subject}.
+            
+            Based on this content: {comprehensive_notes[:1000]}
+            
+            Return ONLY this JSON array:
+            [
+                {{
+                    "question": "Specific question testing understanding of {subtopic}",
+                    "options": ["Detailed option A", "Detailed option B", "Detailed option C", "Detailed option D"],
+                    "correct_answer": 0,
+                    "explanation": "Why this answer is correct"
+                }}
+            ]
+            
+            Generate 8 questions based on the content provided.
+            """
+        
+        quiz_response = await self.invoke_llm(quiz_prompt, bypass_cache=bypass_cache, kind="quiz")
+        cleaned_quiz = self.clean_json_response(quiz_response)
+        
+        try:
+            quiz = json.loads(cleaned_quiz)
+            if not isinstance(quiz, list):
+                raise ValueError("Quiz should be a list")
+        except (json.JSONDecodeError, ValueError) as e:
+            print(f"Quiz generation error for {subtopic}: {e}")
+            # Eight distinct placeholder questions, so clients still get a full-length quiz
+            quiz = [
+                {
+                    "question": question.format(subtopic=subtopic),
+                    "options": options,
+                    "correct_answer": correct_answer,
+                    "explanation": f"This covers the comprehensive understanding of {subtopic}"
+                }
+                for question, options, correct_answer in FALLBACK_QUIZ_QUESTIONS
+            ]
+        
+        return quiz[:8]
+
     async def generate_final_quiz(self, state: CurriculumState) -> CurriculumState:
         """Generate comprehensive final quiz (15-20 questions)"""
         all_subtopics = []
@@ -424,12 +2779,23 @@ class CurriculumAgent:
                 })
                 all_notes.append(subtopic_data['comprehensive_notes'][:500])
         
+        final_quiz = await self.build_final_quiz(
+            state['subject'], all_subtopics, all_notes, bypass_cache=state.get('bypass_cache', False)
+        )
+        
+        state['curriculum_id'] = await self.save_curriculum(state, final_quiz)
+        state['final_curriculum'] = assemble_curriculum(state['course_outline'], state['detailed_content'], final_quiz, state['curriculum_id'])
+        emit_event({"type": "final_quiz", "final_quiz": final_quiz, "curriculum_id": state['curriculum_id']})
+        return state
+
+    async def build_final_quiz(self, subject: str, all_subtopics: List[Dict[str, str]], all_notes: List[str], bypass_cache: bool = False) -> List[Dict[str, Any]]:
+        """Generate the final quiz from subtopic names and note excerpts in outline order"""
         combined_notes = "\n\n".join(all_notes[:10])  # Limit for prompt size
-        is_logical_subject = self.is_math_or_logical_subject(state['subject'])
+        is_logical_subject = self.is_math_or_logical_subject(subject)
         
         if is_logical_subject:
             final_quiz_prompt = f"""
-            Create a comprehensive final quiz of 18 questions for {state['subject']}.
+            Create a comprehensive final quiz of 18 questions for {subject}.
             
             Based on course content:
             {combined_notes}
@@ -455,7 +2821,7 @@ class CurriculumAgent:
             """
         else:
             final_quiz_prompt = f"""
-            Create a comprehensive final quiz of 18 questions for {state['subject']}.
+            Create a comprehensive final quiz of 18 questions for {subject}.
             
             Based on course content:
             {combined_notes}
@@ -478,8 +2844,8 @@ class CurriculumAgent:
             ]
             """
         
-        quiz_response = self.groq_client.invoke(final_quiz_prompt)
-        cleaned_quiz = self.clean_json_response(quiz_response.content)
+        quiz_response = await self.invoke_llm(final_quiz_prompt, bypass_cache=bypass_cache, priority=PRIORITY_CRITICAL, kind="final_quiz")
+        cleaned_quiz = self.clean_json_response(quiz_response)
         
         try:
             final_quiz = json.loads(cleaned_quiz)
@@ -498,30 +2864,226 @@ class CurriculumAgent:
                     "type": "comprehensive"
                 })
         
-        # Combine everything into final curriculum
-        final_curriculum = {
-            "course_title": state['course_outline']['course_title'],
-            "overview": state['course_outline']['overview'],
-            "main_topics": state['detailed_content'],
-            "final_quiz": final_quiz[:18],
-            "total_subtopics": sum(len(topic['subtopics']) for topic in state['detailed_content']),
-            "content_source": "Generated from web-scraped educational content"
+        return final_quiz[:18]
+
+def assemble_curriculum(course_outline: Dict[str, Any], detailed_content: List[Dict[str, Any]], final_quiz: List[Dict[str, Any]], curriculum_id: Optional[str] = None) -> Dict[str, Any]:
+    """Combine everything into final curriculum"""
+    return {
+        "curriculum_id": curriculum_id,
+        "course_title": course_outline['course_title'],
+        "overview": course_outline['overview'],
+        "main_topics": detailed_content,
+        "final_quiz": final_quiz,
+        "total_subtopics": sum(len(topic['subtopics']) for topic in detailed_content),
+        "content_source": "Generated from web-scraped educational content"
+    }
+
+def saved_artifact_ids(entry: Dict[str, Any]) -> List[Optional[str]]:
+    """Content hashes of a saved topic's subtopic artifacts; None where a subtopic was never stored"""
+    return entry.get('artifact_ids') or [None] * len(entry['subtopics'])
+
+def curriculum_index(record: Dict[str, Any]) -> Dict[str, Any]:
+    """A saved curriculum's outline with artifact ids and encoded sizes, without any notes or quizzes"""
+    main_topics = []
+    for topic_index, entry in enumerate(record['main_topics']):
+        sizes = entry.get('subtopic_sizes') or [None] * len(entry['subtopics'])
+        subtopics = [
+            {
+                "subtopic_index": subtopic_index,
+                "subtopic": subtopic,
+                "artifact_id": artifact_id,
+                "size": size
+            }
+            for subtopic_index, (subtopic, artifact_id, size) in enumerate(zip(entry['subtopics'], saved_artifact_ids(entry), sizes))
+        ]
+        main_topics.append({
+            "topic_index": topic_index,
+            "topic": entry['topic'],
+            "size": sum(size or 0 for size in sizes),
+            "subtopics": subtopics
+        })
+    return {
+        "curriculum_id": record['curriculum_id'],
+        "subject": record['subject'],
+        "topics": record['topics'],
+        "course_title": record['course_title'],
+        "overview": record['overview'],
+        "created_at": record['created_at'],
+        "total_subtopics": sum(len(topic['subtopics']) for topic in main_topics),
+        "main_topics": main_topics,
+        "final_quiz_size": len(json_dumps(record['final_quiz']))
+    }
+
+@dataclass
+class CurriculumJob:
+    id: str
+    request: "CurriculumRequest"
+    deadline: float
+    status: str = "queued"
+    subtopics_done: int = 0
+    subtopics_total: int = 0
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    run_stats: Optional[Dict[str, Any]] = None
+    timings: Optional[Dict[str, Any]] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled", "timed_out")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": {
+                "subtopics_done": self.subtopics_done,
+                "subtopics_total": self.subtopics_total
+            },
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "deadline": self.deadline,
+            "error": self.error,
+            "run_stats": self.run_stats,
+            "timings": self.timings,
+            "curriculum": self.result
+        }
+
+class JobQueueFull(Exception):
+    pass
+
+class JobManager:
+    """Bounded queue of curriculum jobs drained by a fixed pool of in-process workers"""
+
+    def __init__(
+        self,
+        run_job,
+        workers: int = JOB_WORKERS,
+        queue_size: int = JOB_QUEUE_SIZE,
+        deadline: float = JOB_DEADLINE_SECONDS,
+        retention: float = JOB_RETENTION_SECONDS
+    ):
+        self.run_job = run_job
+        self.workers = workers
+        self.queue_size = queue_size
+        self.deadline = deadline
+        self.retention = retention
+        self.jobs: Dict[str, CurriculumJob] = {}
+        self.counters = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0, "cancelled": 0, "timed_out": 0}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for job in self.jobs.values():
+            if job.task is not None:
+                job.task.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, request: "CurriculumRequest") -> CurriculumJob:
+        """Queue a job, refusing it when the queue is already full"""
+        self._prune()
+        job = CurriculumJob(id=uuid.uuid4().hex, request=request, deadline=time.time() + self.deadline)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.counters["rejected"] += 1
+            raise JobQueueFull()
+        self.jobs[job.id] = job
+        self.counters["submitted"] += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[CurriculumJob]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[CurriculumJob]:
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        if job.task is not None:
+            job.task.cancel()
+        else:
+            # Still queued: the worker skips it when it comes up
+            self._finish(job, "cancelled")
+        return job
+
+    def _finish(self, job: CurriculumJob, status: str, error: Optional[str] = None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        self.counters[status] += 1
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.finished:
+                    continue
+                remaining = job.deadline - time.time()
+                if remaining <= 0:
+                    self._finish(job, "timed_out", "Job deadline passed while queued")
+                    continue
+                
+                job.status = "running"
+                job.started_at = time.time()
+                job.task = asyncio.create_task(self.run_job(job))
+                try:
+                    await asyncio.wait_for(asyncio.shield(job.task), timeout=remaining)
+                    self._finish(job, "completed")
+                except asyncio.TimeoutError:
+                    job.task.cancel()
+                    self._finish(job, "timed_out", "Job exceeded its deadline")
+                except asyncio.CancelledError:
+                    if not job.task.cancelled():
+                        # The worker itself is being stopped
+                        job.task.cancel()
+                        raise
+                    self._finish(job, "cancelled")
+                except Exception as e:
+                    print(f"Job {job.id} failed: {e}")
+                    self._finish(job, "failed", f"Error generating curriculum: {str(e)}")
+                finally:
+                    job.task = None
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": sum(1 for job in self.jobs.values() if job.status == "running"),
+            "workers": self.workers,
+            "queue_size": self.queue_size
         }
-        
-        state['final_curriculum'] = final_curriculum
-        return state
 
 # Create the LangGraph workflow
-def create_curriculum_workflow(groq_client: ChatGroq, serper_api_key: str) -> StateGraph:
-    agent = CurriculumAgent(groq_client, serper_api_key)
+def create_curriculum_workflow(agent: CurriculumAgent) -> "StateGraph":
+    from langgraph.graph import StateGraph, END
     
     workflow = StateGraph(CurriculumState)
     
-    workflow.add_node("generate_outline", agent.generate_course_outline)
-    workflow.add_node("generate_content", agent.generate_detailed_content)
-    workflow.add_node("generate_final_quiz", agent.generate_final_quiz)
+    workflow.add_node("generate_outline", traced_node("generate_outline", agent.generate_course_outline))
+    workflow.add_node("prefetch_sources", traced_node("prefetch_sources", agent.prefetch_sources))
+    workflow.add_node("generate_content", traced_node("generate_content", agent.generate_detailed_content))
+    workflow.add_node("generate_final_quiz", traced_node("generate_final_quiz", agent.generate_final_quiz))
     
-    workflow.add_edge("generate_outline", "generate_content")
+    workflow.add_edge("generate_outline", "prefetch_sources")
+    workflow.add_edge("prefetch_sources", "generate_content")
     workflow.add_edge("generate_content", "generate_final_quiz")
     workflow.add_edge("generate_final_quiz", END)
     
@@ -529,17 +3091,288 @@ def create_curriculum_workflow(groq_client: ChatGroq, serper_api_key: str) -> St
     
     return workflow.compile()
 
+def create_groq_client() -> "ChatGroq":
+    from langchain_groq import ChatGroq
+    
+    return ChatGroq(
+        api_key=GROQ_API_KEY,
+        model_name="llama-3.1-8b-instant",
+        temperature=0.7,
+        max_tokens=4000,
+        max_retries=0  # retries are handled by the agent's LLMScheduler
+    )
+
+# The Groq client and the compiled workflow are created by load_pipeline, not at import
+curriculum_agent = CurriculumAgent(
+    None,
+    SERPER_API_KEY,
+    page_cache=PageCache() if PAGE_CACHE_ENABLED else None,
+    search_cache=create_search_cache(),
+    completion_cache=create_completion_cache(),
+    artifact_store=create_artifact_store()
+)
+curriculum_workflow = None
+pipeline_lock = threading.Lock()
+
+def load_pipeline():
+    """Import the heavy dependencies and build the Groq client and workflow; blocking, so run it off the event loop"""
+    global curriculum_workflow
+    with pipeline_lock:
+        if curriculum_agent.groq_client is None:
+            curriculum_agent.groq_client = create_groq_client()
+        if curriculum_workflow is None:
+            curriculum_workflow = create_curriculum_workflow(curriculum_agent)
+        # Loaded here so opening the connection pools later does not stall the loop on imports
+        import aiohttp  # noqa: F401
+        import httpx  # noqa: F401
+        import bs4  # noqa: F401
+    return curriculum_workflow
+
+async def ensure_pipeline():
+    """The compiled workflow, loading it in a worker thread on first use"""
+    if curriculum_workflow is None or curriculum_agent.groq_client is None:
+        return await asyncio.to_thread(load_pipeline)
+    return curriculum_workflow
+
+async def invoke_workflow(workflow, state: CurriculumState) -> CurriculumState:
+    """Run the LangGraph workflow, closing the run's background work however it ends"""
+    state['run'] = CurriculumRun(totals=curriculum_agent.dedup_counters)
+    try:
+        return await workflow.ainvoke(state)
+    finally:
+        state['run'].close()
+
+async def stream_workflow(workflow, state: CurriculumState) -> AsyncIterator[Dict[str, Any]]:
+    """Run the LangGraph workflow and yield the outline, subtopic and final quiz events its nodes emit, then the run's stats
+    
+    The caller's state is kept in step with the graph's, so final_curriculum is on it once the stream ends.
+    """
+    state['run'] = CurriculumRun(totals=curriculum_agent.dedup_counters)
+    try:
+        async for mode, chunk in workflow.astream(state, stream_mode=["custom", "values"]):
+            if mode == "custom":
+                yield chunk
+            else:
+                state.update(chunk)
+    finally:
+        # The client may disconnect after the outline, before any subtopic is claimed
+        state['run'].close()
+    yield {"type": "run_stats", "run_stats": state['run'].stats()}
+
+curriculum_flights = SingleFlight()
+curriculum_results = MemoryCache(CURRICULUM_CACHE_MAX_ENTRIES, ttl=CURRICULUM_CACHE_TTL_SECONDS)
+
+async def run_curriculum_job(job: CurriculumJob):
+    """Generate a job's curriculum through the streamed workflow, recording progress as subtopics finish"""
+    request = job.request
+    cache_key = curriculum_cache_key(request.subject, request.topics)
+    if not request.bypass_cache:
+        cached = curriculum_results.get(cache_key)
+        if cached is not None:
+            job.subtopics_total = job.subtopics_done = cached['total_subtopics']
+            job.result = await present_curriculum(cached, request.include_content)
+            return
+    
+    # The job runs in its own task, so these timings cover only this job
+    timings = RequestTimings()
+    current_timings.set(timings)
+    initial_state = CurriculumState(
+        subject=request.subject,
+        topics=request.topics,
+        course_outline={},
+        detailed_content=[],
+        final_curriculum={},
+        bypass_cache=request.bypass_cache
+    )
+    
+    workflow = await ensure_pipeline()
+    async for event in stream_workflow(workflow, initial_state):
+        if event['type'] == "outline":
+            job.subtopics_total = event['total_subtopics']
+        elif event['type'] == "subtopic":
+            job.subtopics_done += 1
+        elif event['type'] == "run_stats":
+            job.run_stats = event['run_stats']
+    
+    curriculum = initial_state['final_curriculum']
+    curriculum_results.set(cache_key, curriculum)
+    job.result = await present_curriculum(curriculum, request.include_content)
+    record_span(REQUEST_SECONDS, "request", time.perf_counter() - timings.started, endpoint="/jobs")
+    if request.include_timings:
+        job.timings = timings.to_dict()
+
+curriculum_jobs = JobManager(run_curriculum_job)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own the app-lifetime connection pools, extraction processes and job workers shared by every request
+    
+    Startup does no heavy work so /health answers at once: the Groq client, the workflow and the
+    extraction processes load in the background and the connection pools open on first use.
+    """
+    http_pool = HttpClientPool()
+    curriculum_agent.http = http_pool
+    workers_up = None
+    if EXTRACT_WORKERS > 0:
+        curriculum_agent.extract_pool = create_extract_pool(EXTRACT_WORKERS)
+        workers_up = asyncio.create_task(asyncio.to_thread(start_extract_workers, curriculum_agent.extract_pool, EXTRACT_WORKERS))
+    await curriculum_jobs.start()
+    warm_up = asyncio.create_task(ensure_pipeline())
+    try:
+        yield
+    finally:
+        warm_up.cancel()
+        if workers_up is not None:
+            workers_up.cancel()
+        await curriculum_jobs.stop()
+        curriculum_agent.http = None
+        await http_pool.close()
+        if curriculum_agent.extract_pool is not None:
+            curriculum_agent.extract_pool.shutdown(cancel_futures=True)
+            curriculum_agent.extract_pool = None
+        # Closed on the storage thread, after any writes still queued there
+        for store in (curriculum_agent.page_cache, curriculum_agent.search_cache, curriculum_agent.completion_cache, curriculum_agent.artifact_store):
+            if store is not None:
+                await run_storage(store, store.close)
+
+HAS_BROTLI = importlib.util.find_spec("brotli") is not None
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with json_dumps (orjson when installed)"""
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """The client's preferred content coding among br (when brotli is installed) and gzip, or None"""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip()] = weight
+    supported = ("br", "gzip") if HAS_BROTLI else ("gzip",)
+    # max keeps the first of equally weighted codings, so br wins ties
+    best = max(supported, key=lambda coding: weights.get(coding, weights.get("*", 0.0)))
+    return best if weights.get(best, weights.get("*", 0.0)) > 0 else None
+
+class ResponseCompressor:
+    """Incremental br or gzip encoder; every chunk is flushed so streamed events are not held back"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            import brotli
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._gzip = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + (self._brotli.finish() if final else self._brotli.flush())
+        return self._gzip.compress(data) + self._gzip.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+    async def compress_async(self, data: bytes, final: bool) -> bytes:
+        # Large bodies are compressed off the event loop
+        if len(data) >= COMPRESS_THREAD_BYTES:
+            return await asyncio.to_thread(self.compress, data, final)
+        return self.compress(data, final)
+
+class CompressionMiddleware:
+    """Compress JSON and NDJSON responses with the negotiated coding; small single-chunk bodies go out as they are"""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", "")) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        start: Optional[Dict[str, Any]] = None
+        compressor: Optional[ResponseCompressor] = None
+        
+        async def send_compressed(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether compressing pays off
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                media_type = headers.get("content-type", "").partition(";")[0].strip()
+                if media_type in COMPRESSIBLE_TYPES and "content-encoding" not in headers:
+                    headers.add_vary_header("Accept-Encoding")
+                    if more_body or len(body) >= self.minimum_size:
+                        compressor = ResponseCompressor(encoding)
+                        headers["Content-Encoding"] = encoding
+                        if more_body:
+                            del headers["Content-Length"]
+                if compressor is not None:
+                    body = await compressor.compress_async(body, not more_body)
+                    if not more_body:
+                        headers["Content-Length"] = str(len(body))
+                await send(start)
+                start = None
+            elif compressor is not None:
+                body = await compressor.compress_async(body, not more_body)
+            await send({**message, "body": body})
+        
+        await self.app(scope, receive, send_compressed)
+
 # FastAPI application
-app = FastAPI(title="Web-Scraping Curriculum Designer API", version="3.0.0")
+app = FastAPI(
+    title="Web-Scraping Curriculum Designer API",
+    version="3.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
+)
 
-groq_client = ChatGroq(
-    api_key=GROQ_API_KEY,
-    model_name="llama-3.1-8b-instant",
-    temperature=0.7,
-    max_tokens=4000
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:3000"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+
+async def saved_curriculum(curriculum_id: str) -> Dict[str, Any]:
+    """Load a saved curriculum record, raising 404 when it is unknown or the store is off"""
+    store = curriculum_agent.artifact_store
+    if store is None:
+        raise HTTPException(status_code=404, detail="Curriculum store is disabled")
+    record = await run_storage(store, store.load_curriculum, curriculum_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Curriculum not found")
+    return record
+
+def saved_topic(record: Dict[str, Any], topic_index: int) -> Dict[str, Any]:
+    if not 0 <= topic_index < len(record['main_topics']):
+        raise HTTPException(status_code=404, detail="Topic not found")
+    return record['main_topics'][topic_index]
 
-curriculum_workflow = create_curriculum_workflow(groq_client, SERPER_API_KEY)
+async def present_curriculum(curriculum: Dict[str, Any], include_content: bool) -> Dict[str, Any]:
+    """The full curriculum, or only its index when the client fetches content from /curricula lazily"""
+    store = curriculum_agent.artifact_store
+    if include_content or not curriculum.get('curriculum_id') or store is None:
+        return curriculum
+    record = await run_storage(store, store.load_curriculum, curriculum['curriculum_id'])
+    return curriculum_index(record) if record is not None else curriculum
 
 @app.post("/generate-curriculum", response_model=CurriculumResponse)
 async def generate_curriculum(request: CurriculumRequest):
@@ -552,21 +3385,215 @@ async def generate_curriculum(request: CurriculumRequest):
         raise HTTPException(status_code=500, detail="API keys not configured")
     
     try:
+        cache_key = curriculum_cache_key(request.subject, request.topics)
+        if not request.bypass_cache:
+            cached = curriculum_results.get(cache_key)
+            if cached is not None:
+                return CurriculumResponse(curriculum=await present_curriculum(cached, request.include_content))
+        
+        async def run_workflow() -> CurriculumResponse:
+            timings = RequestTimings()
+            current_timings.set(timings)
+            initial_state = CurriculumState(
+                subject=request.subject,
+                topics=request.topics,
+                course_outline={},
+                detailed_content=[],
+                final_curriculum={},
+                bypass_cache=request.bypass_cache
+            )
+            
+            workflow = await ensure_pipeline()
+            result = await invoke_workflow(workflow, initial_state)
+            curriculum_results.set(cache_key, result['final_curriculum'])
+            record_span(REQUEST_SECONDS, "request", time.perf_counter() - timings.started, endpoint="/generate-curriculum")
+            return CurriculumResponse(
+                curriculum=result['final_curriculum'],
+                run_stats=result['run'].stats(),
+                timings=timings.to_dict()
+            )
+        
+        # Identical requests already in flight share one workflow execution
+        flight_key = f"{cache_key}:bypass" if request.bypass_cache else cache_key
+        response = await curriculum_flights.run(flight_key, run_workflow)
+        return CurriculumResponse(
+            curriculum=await present_curriculum(response.curriculum, request.include_content),
+            run_stats=response.run_stats,
+            timings=response.timings if request.include_timings else None
+        )
+    
+    except Exception as e:
+        print(f"Error: {e}")
+        raise HTTPException(status_code=500, detail=f"Error generating curriculum: {str(e)}")
+
+@app.post("/generate-curriculum/stream")
+async def generate_curriculum_stream(request: CurriculumRequest):
+    """Stream curriculum generation as NDJSON: outline, then each subtopic as it finishes, then the final quiz"""
+    
+    if not request.subject or not request.topics:
+        raise HTTPException(status_code=400, detail="Subject and topics are required")
+    
+    if not GROQ_API_KEY or not SERPER_API_KEY:
+        raise HTTPException(status_code=500, detail="API keys not configured")
+    
+    initial_state = CurriculumState(
+        subject=request.subject,
+        topics=request.topics,
+        course_outline={},
+        detailed_content=[],
+        final_curriculum={},
+        bypass_cache=request.bypass_cache
+    )
+    
+    async def events():
+        timings = RequestTimings()
+        current_timings.set(timings)
+        try:
+            workflow = await ensure_pipeline()
+            async for event in stream_workflow(workflow, initial_state):
+                yield json_dumps(event) + b"\n"
+            record_span(REQUEST_SECONDS, "request", time.perf_counter() - timings.started, endpoint="/generate-curriculum/stream")
+            if request.include_timings:
+                yield json_dumps({"type": "timings", "timings": timings.to_dict()}) + b"\n"
+            yield json_dumps({"type": "done"}) + b"\n"
+        except Exception as e:
+            print(f"Error: {e}")
+            yield json_dumps({"type": "error", "detail": f"Error generating curriculum: {str(e)}"}) + b"\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/regenerate-curriculum", response_model=CurriculumResponse)
+async def regenerate_curriculum(request: RegenerateRequest):
+    """Regenerate a saved curriculum after a topic edit; only new or changed subtopics and the final quiz are recomputed
+    
+    With bypass_cache every subtopic is generated again instead of reusing stored artifacts.
+    """
+    
+    if not GROQ_API_KEY or not SERPER_API_KEY:
+        raise HTTPException(status_code=500, detail="API keys not configured")
+    
+    base_curriculum = await saved_curriculum(request.curriculum_id)
+    try:
+        topics = apply_topic_diff(base_curriculum['topics'], request.add_topics, request.remove_topics, request.replace_topics)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not topics:
+        raise HTTPException(status_code=400, detail="Subject and topics are required")
+    
+    try:
+        timings = RequestTimings()
+        current_timings.set(timings)
         initial_state = CurriculumState(
-            subject=request.subject,
-            topics=request.topics,
+            subject=base_curriculum['subject'],
+            topics=topics,
             course_outline={},
             detailed_content=[],
-            final_curriculum={}
+            final_curriculum={},
+            bypass_cache=request.bypass_cache,
+            base_curriculum=base_curriculum
         )
         
-        result = await curriculum_workflow.ainvoke(initial_state)
-        
-        return CurriculumResponse(curriculum=result['final_curriculum'])
+        workflow = await ensure_pipeline()
+        result = await invoke_workflow(workflow, initial_state)
+        curriculum_results.set(curriculum_cache_key(base_curriculum['subject'], topics), result['final_curriculum'])
+        record_span(REQUEST_SECONDS, "request", time.perf_counter() - timings.started, endpoint="/regenerate-curriculum")
+        return CurriculumResponse(
+            curriculum=await present_curriculum(result['final_curriculum'], request.include_content),
+            run_stats=result['run'].stats(),
+            timings=timings.to_dict() if request.include_timings else None,
+            reused_subtopics=len(result.get('reused') or {})
+        )
     
     except Exception as e:
         print(f"Error: {e}")
-        raise HTTPException(status_code=500, detail=f"Error generating curriculum: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error regenerating curriculum: {str(e)}")
+
+@app.get("/curricula/{curriculum_id}")
+async def get_curriculum_index(curriculum_id: str):
+    """Outline of a saved curriculum with subtopic artifact ids and sizes; content is fetched per topic or subtopic"""
+    # Returned as a response so FastAPI skips jsonable_encoder on the plain dict
+    return FastJSONResponse(curriculum_index(await saved_curriculum(curriculum_id)))
+
+@app.get("/curricula/{curriculum_id}/final-quiz")
+async def get_curriculum_final_quiz(curriculum_id: str):
+    """The saved curriculum's final quiz"""
+    record = await saved_curriculum(curriculum_id)
+    return FastJSONResponse({"curriculum_id": curriculum_id, "final_quiz": record['final_quiz']})
+
+@app.get("/curricula/{curriculum_id}/topics/{topic_index}")
+async def get_curriculum_topic(curriculum_id: str, topic_index: int, offset: int = 0, limit: int = CURRICULUM_PAGE_SIZE):
+    """A page of one main topic's subtopics with their notes and quizzes; expired subtopics come back as null"""
+    if offset < 0 or limit < 1:
+        raise HTTPException(status_code=400, detail="offset must be >= 0 and limit >= 1")
+    record = await saved_curriculum(curriculum_id)
+    entry = saved_topic(record, topic_index)
+    limit = min(limit, CURRICULUM_MAX_PAGE_SIZE)
+    store = curriculum_agent.artifact_store
+    
+    def load_page(artifact_ids: List[Optional[str]]) -> List[bytes]:
+        return [store.get_encoded(artifact_id) or b"null" for artifact_id in artifact_ids]
+    
+    artifacts = await run_storage(store, load_page, saved_artifact_ids(entry)[offset:offset + limit])
+    page = json_dumps({
+        "curriculum_id": curriculum_id,
+        "topic_index": topic_index,
+        "topic": entry['topic'],
+        "offset": offset,
+        "limit": limit,
+        "total": len(entry['subtopics'])
+    })
+    # Stored artifacts are already JSON: splice them in rather than decoding and re-encoding them
+    return Response(page[:-1] + b',"subtopics":[' + b",".join(artifacts) + b"]}", media_type="application/json")
+
+@app.get("/curricula/{curriculum_id}/topics/{topic_index}/subtopics/{subtopic_index}")
+async def get_curriculum_subtopic(curriculum_id: str, topic_index: int, subtopic_index: int):
+    """One subtopic's notes, learning URLs and quiz"""
+    record = await saved_curriculum(curriculum_id)
+    entry = saved_topic(record, topic_index)
+    if not 0 <= subtopic_index < len(entry['subtopics']):
+        raise HTTPException(status_code=404, detail="Subtopic not found")
+    store = curriculum_agent.artifact_store
+    artifact = await run_storage(store, store.get_encoded, saved_artifact_ids(entry)[subtopic_index])
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Subtopic content has expired from the store")
+    return Response(artifact, media_type="application/json")
+
+@app.post("/jobs", status_code=202)
+async def submit_curriculum_job(request: CurriculumRequest):
+    """Queue curriculum generation and return a job id to poll"""
+    
+    if not request.subject or not request.topics:
+        raise HTTPException(status_code=400, detail="Subject and topics are required")
+    
+    if not GROQ_API_KEY or not SERPER_API_KEY:
+        raise HTTPException(status_code=500, detail="API keys not configured")
+    
+    try:
+        job = curriculum_jobs.submit(request)
+    except JobQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Job queue is full, retry later",
+            headers={"Retry-After": "30"}
+        )
+    
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}")
+async def get_curriculum_job(job_id: str):
+    """Job status, progress (subtopics done/total) and the curriculum once completed"""
+    job = curriculum_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.delete("/jobs/{job_id}")
+async def cancel_curriculum_job(job_id: str):
+    """Cancel a queued or running job"""
+    job = curriculum_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
 @app.get("/health")
 async def health_check():
@@ -577,6 +3604,44 @@ async def health_check():
         "features": ["web_scraping", "content_generation", "comprehensive_notes"]
     }
 
+@app.get("/stats")
+async def stats():
+    """Runtime statistics for connection pools and caches"""
+    return {
+        "http_pools": curriculum_agent.http.stats() if curriculum_agent.http else None,
+        "downloads": curriculum_agent.download_counters,
+        "hedging": curriculum_agent.hedge_counters,
+        "llm_calls": curriculum_agent.llm_calls,
+        "dedup": curriculum_agent.dedup_counters,
+        "prefetch": {
+            "enabled": curriculum_agent.prefetch_enabled,
+            "buffer": curriculum_agent.prefetch_buffer,
+            **curriculum_agent.prefetch_counters
+        },
+        "batching": {
+            "mode": "batched" if curriculum_agent.batched_generation else "separate",
+            "batch_size": curriculum_agent.batch_size,
+            **curriculum_agent.batch_counters
+        },
+        "hosts": curriculum_agent.hosts.stats(),
+        "llm_scheduler": curriculum_agent.llm_scheduler.stats(),
+        "page_cache": curriculum_agent.page_cache.stats() if curriculum_agent.page_cache else None,
+        "search_cache": curriculum_agent.search_cache.stats() if curriculum_agent.search_cache else None,
+        "completion_cache": curriculum_agent.completion_cache.stats() if curriculum_agent.completion_cache else None,
+        "artifact_store": curriculum_agent.artifact_store.stats() if curriculum_agent.artifact_store else None,
+        "response_encoding": {"orjson": HAS_ORJSON, "brotli": HAS_BROTLI, "compress_min_bytes": COMPRESS_MIN_BYTES},
+        "curriculum_requests": {
+            **curriculum_flights.stats(),
+            "result_cache": curriculum_results.stats()
+        },
+        "jobs": curriculum_jobs.stats()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage latency histograms and LLM token counters in Prometheus text format"""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {
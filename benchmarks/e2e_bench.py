@@ -0,0 +1,356 @@
+"""Benchmark the whole /generate-curriculum pipeline offline.
+
+Groq, Serper and the scraped sites are replaced by local stand-ins with
+configurable latency and failure rates: a fake ChatGroq returning canned JSON
+and markdown, a Serper-compatible search server and a site server replaying
+the saved HTML fixtures. The stand-in servers run in a child process so their
+work never competes with the app for its event loop; the FastAPI app runs
+in-process (with its lifespan), is driven at a fixed concurrency, and the run reports throughput,
+p50/p95/p99 latency, event-loop lag and peak RSS.
+
+    python benchmarks/e2e_bench.py [--requests 20] [--concurrency 4] [--llm-latency 0.3] [--json]
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import re
+import resource
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+# search_content only keeps links on known educational domains, so fixture URLs carry one in their path
+SITE_DOMAINS = ["khanacademy.org", "geeksforgeeks.org", "w3schools.com", "tutorialspoint.com", "medium.com", "mit.edu"]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20, help="curriculum requests to send")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight at once")
+    parser.add_argument("--topics", type=int, default=2, help="main topics per request")
+    parser.add_argument("--subtopics", type=int, default=4, help="subtopics per main topic in the fake outline")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds per fake completion")
+    parser.add_argument("--llm-jitter", type=float, default=0.1, help="uniform +/- seconds added to each completion")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="share of completions failing with a connection error")
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    parser.add_argument("--search-failure-rate", type=float, default=0.0)
+    parser.add_argument("--page-latency", type=float, default=0.1)
+    parser.add_argument("--page-failure-rate", type=float, default=0.05, help="share of page fetches answered with 503")
+    parser.add_argument("--groq-rpm", type=int, default=100000, help="GROQ_REQUESTS_PER_MINUTE for the run")
+    parser.add_argument("--groq-tpm", type=int, default=100000000, help="GROQ_TOKENS_PER_MINUTE for the run")
+    parser.add_argument("--generation-mode", choices=("separate", "batched"), default="separate", help="GENERATION_MODE for the run")
+    parser.add_argument("--batch-size", type=int, default=1, help="LLM_BATCH_SIZE: sibling subtopics per batched prompt")
+    parser.add_argument("--polite", action="store_true", help="keep the default per-host limits (all fixture pages share one host)")
+    parser.add_argument("--cache", action="store_true", help="send requests without bypass_cache, so the completion and curriculum caches apply")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="keep the agent's own log output")
+    return parser.parse_args()
+
+def configure_environment(args, cache_dir: str):
+    """Point agent.py at the local stand-ins; must run before agent is imported"""
+    os.environ["GROQ_API_KEY"] = "benchmark"
+    os.environ["SERPER_API_KEY"] = "benchmark"
+    os.environ["SERPER_URL"] = f"http://127.0.0.1:{args.port}/search"
+    os.environ["CACHE_DIR"] = cache_dir
+    os.environ["GROQ_REQUESTS_PER_MINUTE"] = str(args.groq_rpm)
+    os.environ["GROQ_TOKENS_PER_MINUTE"] = str(args.groq_tpm)
+    os.environ["LLM_BACKOFF_BASE_SECONDS"] = "0.05"
+    os.environ["GENERATION_MODE"] = args.generation_mode
+    os.environ["LLM_BATCH_SIZE"] = str(args.batch_size)
+    if not args.polite:
+        os.environ["HOST_MAX_CONCURRENCY"] = "1000"
+        os.environ["HOST_RATE_PER_SECOND"] = "100000"
+        os.environ["HOST_BURST"] = "100000"
+
+class FakeChatGroq:
+    """Stand-in for ChatGroq.ainvoke answering each prompt type with canned content"""
+
+    model_name = "fake-llm"
+    temperature = 0.7
+    max_tokens = 4000
+
+    def __init__(self, latency: float, jitter: float, failure_rate: float, subtopics: int, rng: random.Random):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.subtopics = subtopics
+        self.rng = rng
+        self.calls = 0
+        self.failures = 0
+
+    def answer(self, prompt: str) -> str:
+        if "Create comprehensive subtopics" in prompt:
+            topics = re.search(r"Main topics: (.*)", prompt).group(1).split(", ")
+            return json.dumps({
+                "course_title": "Benchmark Course",
+                "overview": "Generated by the benchmark's fake LLM",
+                "main_topics": [
+                    {"topic": topic, "subtopics": [f"{topic} part {index + 1}" for index in range(self.subtopics)]}
+                    for topic in topics
+                ]
+            })
+        if "=== SUBTOPIC 1 ===" in prompt:
+            count = len(re.findall(r"^\s*Subtopic \d+: ", prompt, re.MULTILINE))
+            return "\n".join(
+                f"=== SUBTOPIC {number} ===\n--- NOTES ---\n{self.notes()}\n--- QUIZ ---\n{self.quiz(8)}\n=== END ==="
+                for number in range(1, count + 1)
+            )
+        if "final quiz" in prompt:
+            return self.quiz(18)
+        if "JSON array" in prompt:
+            return self.quiz(8)
+        return self.notes()
+
+    def notes(self) -> str:
+        sections = "\n\n".join(
+            f"## Section {index}\n- Key point about the concept\n- A worked example with $x^2 + y^2 = z^2$\n" + "Explanation text. " * 40
+            for index in range(1, 6)
+        )
+        return f"# Study notes\n\n{sections}"
+
+    def quiz(self, questions: int) -> str:
+        return "```json\n" + json.dumps([
+            {
+                "question": f"Question {index + 1}?",
+                "options": ["Option A", "Option B", "Option C", "Option D"],
+                "correct_answer": index % 4,
+                "explanation": "Because the notes say so."
+            }
+            for index in range(questions)
+        ], indent=2) + "\n```"
+
+    async def ainvoke(self, prompt: str):
+        from groq import APIConnectionError
+        import httpx
+        from langchain_core.messages import AIMessage
+
+        self.calls += 1
+        await asyncio.sleep(max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)))
+        if self.rng.random() < self.failure_rate:
+            self.failures += 1
+            raise APIConnectionError(request=httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions"))
+        content = self.answer(prompt)
+        input_tokens, output_tokens = len(prompt) // 4 + 1, len(content) // 4 + 1
+        return AIMessage(content=content, usage_metadata={
+            "input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens
+        })
+
+def load_fixtures():
+    fixtures = {}
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if name.endswith(".html"):
+            with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+                fixtures[name[:-len(".html")]] = f.read()
+    return fixtures
+
+def create_stub_app(args, fixtures, rng: random.Random, counters) -> web.Application:
+    """Serper-compatible /search plus a site replaying the HTML fixtures under /<domain>/<fixture>/<n>; counters are shared multiprocessing values"""
+    names = list(fixtures)
+    base = f"http://127.0.0.1:{args.port}"
+
+    async def search(request: web.Request) -> web.Response:
+        counters["searches"].value += 1
+        payload = await request.json()
+        await asyncio.sleep(args.search_latency)
+        if rng.random() < args.search_failure_rate:
+            return web.Response(status=500)
+        # Stable per query, so repeated queries see the same results as they would live
+        digest = int(hashlib.sha256(payload["q"].encode()).hexdigest(), 16)
+        organic = []
+        for rank in range(payload.get("num", 10)):
+            name = names[(digest + rank) % len(names)]
+            domain = SITE_DOMAINS[(digest // 7 + rank) % len(SITE_DOMAINS)]
+            organic.append({
+                "title": f"{name} ({rank})",
+                "link": f"{base}/{domain}/{name}/{digest % 100000}-{rank}",
+                "snippet": "Fixture page"
+            })
+        return web.json_response({"organic": organic})
+
+    async def page(request: web.Request) -> web.Response:
+        counters["pages"].value += 1
+        await asyncio.sleep(args.page_latency)
+        if rng.random() < args.page_failure_rate:
+            return web.Response(status=503)
+        html = fixtures.get(request.match_info["name"])
+        if html is None:
+            return web.Response(status=404)
+        return web.Response(text=html, content_type="text/html")
+
+    app = web.Application()
+    app.router.add_post("/search", search)
+    app.router.add_get("/{domain}/{name}/{page}", page)
+    return app
+
+def serve_stubs(args, counters, ready):
+    """Child process entry point: serve the stand-ins on their own event loop until terminated"""
+    async def serve():
+        runner = web.AppRunner(create_stub_app(args, load_fixtures(), random.Random(args.seed), counters))
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", args.port).start()
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+@contextlib.contextmanager
+def stub_servers(args):
+    """Run the stand-in servers in a separate process and yield their request counters"""
+    context = multiprocessing.get_context("spawn")
+    counters = {"searches": context.Value("i", 0, lock=False), "pages": context.Value("i", 0, lock=False)}
+    ready = context.Event()
+    process = context.Process(target=serve_stubs, args=(args, counters, ready), name="bench-stubs", daemon=True)
+    process.start()
+    try:
+        if not ready.wait(30):
+            raise RuntimeError(f"stub servers did not start on port {args.port}")
+        yield counters
+    finally:
+        process.terminate()
+        process.join()
+
+async def monitor_loop_lag(samples, stop: asyncio.Event, interval: float = 0.01):
+    """Record how late a fixed-interval sleep wakes up; large values mean something blocked the loop"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - expected))
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+async def run_benchmark(args, stub_counters):
+    import agent
+    import httpx
+
+    rng = random.Random(args.seed)
+    fake_llm = FakeChatGroq(args.llm_latency, args.llm_jitter, args.llm_failure_rate, args.subtopics, rng)
+    agent.curriculum_agent.groq_client = fake_llm
+
+    latencies = []
+    errors = []
+    lag_samples = []
+    stop = asyncio.Event()
+    queue = asyncio.Queue()
+    for index in range(args.requests):
+        queue.put_nowait(index)
+
+    async def client(http: httpx.AsyncClient):
+        while True:
+            try:
+                index = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            body = {
+                "subject": f"Benchmark subject {index}",
+                "topics": [f"Topic {topic + 1}" for topic in range(args.topics)],
+                "bypass_cache": not args.cache
+            }
+            started = time.perf_counter()
+            try:
+                response = await http.post("/generate-curriculum", json=body)
+                if response.status_code != 200:
+                    errors.append(f"HTTP {response.status_code}")
+                    continue
+            except Exception as e:
+                errors.append(repr(e))
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    async with agent.lifespan(agent.app):
+        transport = httpx.ASGITransport(app=agent.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+            monitor = asyncio.create_task(monitor_loop_lag(lag_samples, stop))
+            started = time.perf_counter()
+            await asyncio.gather(*(client(http) for _ in range(args.concurrency)))
+            wall = time.perf_counter() - started
+            stop.set()
+            await monitor
+            stats = (await http.get("/stats")).json()
+
+    llm_calls = sum(usage["calls"] for usage in stats["llm_calls"].values())
+    prompt_tokens = sum(usage["prompt_tokens"] for usage in stats["llm_calls"].values())
+    return {
+        "config": {
+            key: getattr(args, key) for key in (
+                "requests", "concurrency", "topics", "subtopics", "llm_latency", "llm_failure_rate",
+                "search_latency", "page_latency", "page_failure_rate", "generation_mode", "batch_size", "polite", "cache"
+            )
+        },
+        "completed": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else 0.0,
+        "latency_seconds": {
+            "p50": round(percentile(latencies, 0.50), 3),
+            "p95": round(percentile(latencies, 0.95), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+            "max": round(max(latencies, default=0.0), 3)
+        },
+        "loop_lag_ms": {
+            "p50": round(percentile(lag_samples, 0.50) * 1000, 2),
+            "p99": round(percentile(lag_samples, 0.99) * 1000, 2),
+            "max": round(max(lag_samples, default=0.0) * 1000, 2)
+        },
+        # ru_maxrss is in kilobytes on Linux; extraction workers show up under children
+        "peak_rss_mb": {
+            "main": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+        },
+        "upstream": {
+            "llm_calls": llm_calls,
+            "llm_prompt_tokens": prompt_tokens,
+            "llm_attempts": fake_llm.calls,
+            "llm_failures_injected": fake_llm.failures,
+            "searches": stub_counters["searches"].value,
+            "page_fetches": stub_counters["pages"].value
+        }
+    }
+
+def print_report(report):
+    print(f"requests      {report['completed']} ok, {report['errors']} failed in {report['wall_seconds']} s")
+    print(f"throughput    {report['throughput_rps']} req/s")
+    latency = report["latency_seconds"]
+    print(f"latency (s)   p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+    lag = report["loop_lag_ms"]
+    print(f"loop lag (ms) p50 {lag['p50']}  p99 {lag['p99']}  max {lag['max']}")
+    rss = report["peak_rss_mb"]
+    print(f"peak RSS (MB) main {rss['main']}  children {rss['children']}")
+    upstream = report["upstream"]
+    print(f"mode          {report['config']['generation_mode']} (batch size {report['config']['batch_size']})")
+    print(f"upstream      {upstream['llm_calls']} LLM calls ({upstream['llm_prompt_tokens']} prompt tokens) in {upstream['llm_attempts']} attempts ({upstream['llm_failures_injected']} failed), "
+          f"{upstream['searches']} searches, {upstream['page_fetches']} page fetches")
+    for sample in report["error_samples"]:
+        print(f"error         {sample}")
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory(prefix="curriculum-bench-") as cache_dir:
+        configure_environment(args, cache_dir)
+        sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with output, stub_servers(args) as stub_counters:
+            report = asyncio.run(run_benchmark(args, stub_counters))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
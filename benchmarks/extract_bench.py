@@ -0,0 +1,71 @@
+"""Benchmark the page-text extractors against saved HTML fixtures.
+
+Compares every available backend with the reference BeautifulSoup extractor
+on speed (mean ms per page) and output parity (exact match, or similarity
+ratio when the outputs differ).
+
+    python benchmarks/extract_bench.py [--iterations 20] [--fixtures DIR]
+"""
+import argparse
+import difflib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+import agent  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def load_fixtures(directory: str):
+    fixtures = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".html"):
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                fixtures[name] = f.read()
+    return fixtures
+
+def time_extractor(extractor, html: str, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        extractor(html)
+    return (time.perf_counter() - start) / iterations * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    args = parser.parse_args()
+    
+    backends = {"bs4": agent.extract_page_text_bs4}
+    if agent.HAS_LXML:
+        backends["lxml"] = agent.extract_page_text_lxml
+    else:
+        print("lxml is not installed; only the reference backend is measured\n")
+    
+    fixtures = load_fixtures(args.fixtures)
+    header = f"{'fixture':<28}{'KB':>7}" + "".join(f"{name + ' ms':>12}" for name in backends)
+    if "lxml" in backends:
+        header += f"{'speedup':>10}{'parity':>10}"
+    print(header)
+    
+    totals = {name: 0.0 for name in backends}
+    for fixture, html in fixtures.items():
+        timings = {name: time_extractor(extractor, html, args.iterations) for name, extractor in backends.items()}
+        for name, elapsed in timings.items():
+            totals[name] += elapsed
+        
+        row = f"{fixture:<28}{len(html.encode('utf-8')) / 1024:>7.0f}" + "".join(f"{timings[name]:>12.2f}" for name in backends)
+        if "lxml" in backends:
+            reference = agent.extract_page_text_bs4(html)
+            output = agent.extract_page_text_lxml(html)
+            parity = "exact" if output == reference else f"{difflib.SequenceMatcher(None, reference, output).ratio():.3f}"
+            row += f"{timings['bs4'] / timings['lxml']:>9.1f}x{parity:>10}"
+        print(row)
+    
+    print(f"{'total':<35}" + "".join(f"{totals[name]:>12.2f}" for name in backends))
+
+if __name__ == "__main__":
+    main()
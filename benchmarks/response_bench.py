@@ -0,0 +1,141 @@
+"""Benchmark curriculum response payloads.
+
+Stores a synthetic curriculum, then fetches it through the app (in process, no
+network or API keys) as the full /generate-curriculum body and through the lazy
+/curricula endpoints, reporting bytes on the wire, time and peak Python memory
+per response for each Accept-Encoding.
+
+    python benchmarks/response_bench.py [--topics 12] [--subtopics 5] [--notes-chars 6000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+ENCODINGS = ("identity", "gzip", "br")
+
+def configure_environment(cache_dir: str):
+    # Must run before agent is imported: its configuration is read at import time
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ.setdefault("SERPER_API_KEY", "benchmark")
+    os.environ["CACHE_DIR"] = cache_dir
+    os.environ["ARTIFACT_STORE_BACKEND"] = "disk"
+
+def synthetic_text(rng: random.Random, chars: int) -> str:
+    """Varied prose from a small vocabulary, so compression ratios are not flattered by repetition"""
+    words = []
+    length = 0
+    while length < chars:
+        word = "".join(rng.choice("etaoinshrdlucmfwypvbgk") for _ in range(rng.randint(2, 9)))
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:chars]
+
+async def store_curriculum(agent, args):
+    """Save a synthetic curriculum as /generate-curriculum would; returns (curriculum id, subject, topics)"""
+    subject = "Physics"
+    topics = [f"Topic {topic}" for topic in range(args.topics)]
+    rng = random.Random(0)
+    quiz = [
+        {
+            "question": synthetic_text(rng, 90) + "?",
+            "options": ["First option", "Second option", "Third option", "Fourth option"],
+            "correct_answer": number % 4,
+            "explanation": synthetic_text(rng, 160)
+        }
+        for number in range(8)
+    ]
+    state = {
+        "subject": subject,
+        "topics": topics,
+        "course_outline": {
+            "course_title": f"Complete {subject} Course",
+            "overview": "Synthetic benchmark course",
+            "main_topics": [
+                {"topic": topic, "subtopics": [f"{topic} subtopic {index}" for index in range(args.subtopics)]}
+                for topic in topics
+            ]
+        },
+        "artifacts": {}
+    }
+    detailed_content = []
+    for topic_index, main_topic in enumerate(state['course_outline']['main_topics']):
+        contents = []
+        for subtopic_index, subtopic in enumerate(main_topic['subtopics']):
+            content = {
+                "subtopic": subtopic,
+                "comprehensive_notes": f"# {subtopic}\n\n{synthetic_text(rng, args.notes_chars)}",
+                "learning_urls": [f"https://ocw.mit.edu/{topic_index}/{subtopic_index}/{k}" for k in range(3)],
+                "quiz": quiz
+            }
+            state['artifacts'][(topic_index, subtopic_index)] = agent.curriculum_agent.artifact_store.put(
+                subject, main_topic['topic'], subtopic, content
+            )
+            contents.append(content)
+        detailed_content.append({"main_topic": main_topic['topic'], "subtopics": contents})
+
+    final_quiz = quiz * 2
+    curriculum_id = await agent.curriculum_agent.save_curriculum(state, final_quiz)
+    curriculum = agent.assemble_curriculum(state['course_outline'], detailed_content, final_quiz, curriculum_id)
+    agent.curriculum_results.set(agent.curriculum_cache_key(subject, topics), curriculum)
+    return curriculum_id, subject, topics
+
+async def measure(client, method: str, path: str, encoding: str, repeat: int, body=None):
+    sizes = []
+    seconds = []
+    peaks = []
+    for _ in range(repeat):
+        tracemalloc.start()
+        started = time.perf_counter()
+        response = await client.request(method, path, json=body, headers={"accept-encoding": encoding})
+        seconds.append(time.perf_counter() - started)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        response.raise_for_status()
+        sizes.append(int(response.headers.get("content-length") or len(response.content)))
+    return sizes[-1], statistics.median(seconds), statistics.median(peaks)
+
+async def run(args):
+    import httpx
+    import agent
+
+    curriculum_id, subject, topics = await store_curriculum(agent, args)
+    requests = [
+        ("full curriculum", "POST", "/generate-curriculum", {"subject": subject, "topics": topics}),
+        ("index only", "POST", "/generate-curriculum", {"subject": subject, "topics": topics, "include_content": False}),
+        ("GET index", "GET", f"/curricula/{curriculum_id}", None),
+        ("GET topic page", "GET", f"/curricula/{curriculum_id}/topics/0", None),
+        ("GET subtopic", "GET", f"/curricula/{curriculum_id}/topics/0/subtopics/0", None),
+    ]
+    encodings = [encoding for encoding in ENCODINGS if encoding != "br" or agent.HAS_BROTLI]
+    print(f"{args.topics} topics x {args.subtopics} subtopics, {args.notes_chars} note chars each; orjson={agent.HAS_ORJSON} brotli={agent.HAS_BROTLI}")
+    print(f"{'request':<18}{'encoding':<10}{'bytes':>10}{'ms':>9}{'peak KB':>10}")
+    transport = httpx.ASGITransport(app=agent.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, method, path, body in requests:
+            for encoding in encodings:
+                size, seconds, peak = await measure(client, method, path, encoding, args.repeat, body)
+                print(f"{name:<18}{encoding:<10}{size:>10}{seconds * 1000:>9.2f}{peak / 1024:>10.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--topics", type=int, default=12)
+    parser.add_argument("--subtopics", type=int, default=5)
+    parser.add_argument("--notes-chars", type=int, default=6000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        configure_environment(cache_dir)
+        asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark cold start of agent.py.
+
+Measures, each in a fresh interpreter, how long `import agent` takes and how
+long `uvicorn agent:app` takes from process start until /health answers.
+
+    python benchmarks/startup_bench.py [--runs 5] [--port 8791] [--app-dir DIR]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCH_DIR, "..")
+
+def environment():
+    env = dict(os.environ)
+    env.setdefault("GROQ_API_KEY", "benchmark")
+    env.setdefault("SERPER_API_KEY", "benchmark")
+    return env
+
+def time_import(app_dir: str) -> float:
+    code = "import time; started = time.perf_counter(); import agent; print(time.perf_counter() - started)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=app_dir, env=environment(),
+        check=True, capture_output=True, text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+def time_first_health(app_dir: str, port: int, timeout: float = 60) -> float:
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "agent:app", "--port", str(port), "--log-level", "warning"],
+        cwd=app_dir, env=environment(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("/health did not answer")
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8791)
+    parser.add_argument("--app-dir", default=APP_DIR, help="directory containing the agent.py to measure")
+    args = parser.parse_args()
+
+    imports = [time_import(args.app_dir) for _ in range(args.runs)]
+    health = [time_first_health(args.app_dir, args.port) for _ in range(args.runs)]
+    for name, samples in (("import agent", imports), ("first /health", health)):
+        print(f"{name:<16}median {statistics.median(samples) * 1000:>7.0f} ms   min {min(samples) * 1000:>7.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""/health must keep answering quickly while curricula are being generated"""
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+HEALTH_BOUND_SECONDS = 0.25
+LLM_LATENCY_SECONDS = 0.5
+CURRICULA = 3
+PROBE_INTERVAL_SECONDS = 0.05
+
+class SlowChatGroq:
+    """Stand-in for ChatGroq.ainvoke that takes LLM_LATENCY_SECONDS per completion"""
+
+    model_name = "slow-fake-llm"
+    temperature = 0.7
+    max_tokens = 4000
+
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, prompt: str):
+        from langchain_core.messages import AIMessage
+
+        self.calls += 1
+        await asyncio.sleep(LLM_LATENCY_SECONDS)
+        if "Create comprehensive subtopics" in prompt:
+            topics = re.search(r"Main topics: (.*)", prompt).group(1).split(", ")
+            content = json.dumps({
+                "course_title": "Test Course",
+                "overview": "Generated by the slow fake LLM",
+                "main_topics": [{"topic": topic, "subtopics": [f"{topic} part 1", f"{topic} part 2"]} for topic in topics]
+            })
+        else:
+            content = "# Notes\n\nPlain text, so quizzes fall back to their placeholders."
+        return AIMessage(content=content)
+
+def configure_environment(monkeypatch, cache_dir):
+    # Must run before agent is imported: its configuration is read at import time
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setenv("SERPER_API_KEY", "test")
+    # Nothing listens on the discard port, so every search fails fast and no page is scraped
+    monkeypatch.setenv("SERPER_URL", "http://127.0.0.1:9/search")
+    monkeypatch.setenv("CACHE_DIR", str(cache_dir))
+    monkeypatch.setenv("GROQ_REQUESTS_PER_MINUTE", "100000")
+    monkeypatch.setenv("GROQ_TOKENS_PER_MINUTE", "100000000")
+    monkeypatch.setenv("EXTRACT_WORKERS", "0")
+
+async def check_health_while_generating():
+    import httpx
+    import agent
+
+    fake_llm = SlowChatGroq()
+    agent.curriculum_agent.groq_client = fake_llm
+    async with agent.lifespan(agent.app):
+        transport = httpx.ASGITransport(app=agent.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+            curricula = [
+                asyncio.create_task(client.post("/generate-curriculum", json={
+                    "subject": f"Subject {index}", "topics": ["Topic A", "Topic B"], "bypass_cache": True
+                }))
+                for index in range(CURRICULA)
+            ]
+            while fake_llm.calls < CURRICULA:
+                await asyncio.sleep(0.01)
+
+            # Timed from when each probe is due, so a stalled event loop counts against /health
+            # even though ASGITransport runs the request itself inline
+            health_seconds = []
+            while not all(task.done() for task in curricula):
+                due = time.perf_counter() + PROBE_INTERVAL_SECONDS
+                await asyncio.sleep(PROBE_INTERVAL_SECONDS)
+                response = await client.get("/health")
+                health_seconds.append(time.perf_counter() - due)
+                assert response.status_code == 200
+                assert response.json()["status"] == "healthy"
+
+            for task in curricula:
+                assert (await task).status_code == 200
+    return health_seconds
+
+def test_health_stays_responsive_during_generation(monkeypatch, tmp_path):
+    configure_environment(monkeypatch, tmp_path)
+    health_seconds = asyncio.run(check_health_while_generating())
+
+    assert len(health_seconds) >= 5
+    assert max(health_seconds) < HEALTH_BOUND_SECONDS, f"slowest /health took {max(health_seconds):.3f}s"
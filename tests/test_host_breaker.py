@@ -0,0 +1,83 @@
+"""The per-host circuit breaker must stop requests that were already queued and allow one half-open probe at a time"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+def configure_environment(monkeypatch, cache_dir):
+    # Must run before agent is imported: its configuration is read at import time
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setenv("SERPER_API_KEY", "test")
+    monkeypatch.setenv("CACHE_DIR", str(cache_dir))
+
+def create_host(agent, concurrency: int, cooldown: float = 60):
+    return agent.HostState(concurrency=concurrency, rate=1000, burst=1000, failure_threshold=1, cooldown=cooldown)
+
+async def send_failing_requests(host, count: int) -> int:
+    sent = 0
+
+    async def request():
+        nonlocal sent
+        async with host.request() as outcome:
+            if not outcome.allowed:
+                return
+            sent += 1
+            await asyncio.sleep(0.01)
+            outcome.status = 503
+
+    await asyncio.gather(*(request() for _ in range(count)))
+    return sent
+
+async def probe_survives_cancelled_request(host) -> bool:
+    """Whether a request is let through while the half-open probe is still in flight"""
+    release = asyncio.Event()
+
+    async def held(status):
+        async with host.request() as outcome:
+            assert outcome.allowed
+            await release.wait()
+            outcome.status = status
+
+    async def failing():
+        async with host.request() as outcome:
+            outcome.status = 503
+
+    # Admitted while the circuit is closed, then cancelled like a losing hedged scrape
+    old = asyncio.create_task(held(200))
+    await asyncio.sleep(0)
+    await failing()
+    assert host.circuit == "open"
+    await asyncio.sleep(host.cooldown)
+
+    probe = asyncio.create_task(held(200))
+    await asyncio.sleep(0)
+    assert host.circuit == "half_open"
+    old.cancel()
+    await asyncio.gather(old, return_exceptions=True)
+
+    async with host.request() as outcome:
+        let_through = outcome.allowed
+    release.set()
+    await probe
+    return let_through
+
+def test_queued_requests_are_not_sent_once_the_circuit_opens(monkeypatch, tmp_path):
+    configure_environment(monkeypatch, tmp_path)
+    import agent
+
+    host = create_host(agent, concurrency=1)
+    sent = asyncio.run(send_failing_requests(host, 5))
+
+    assert sent == 1
+    assert host.circuit == "open"
+    assert host.stats()["short_circuited"] == 4
+
+def test_only_the_probe_releases_the_half_open_slot(monkeypatch, tmp_path):
+    configure_environment(monkeypatch, tmp_path)
+    import agent
+
+    host = create_host(agent, concurrency=3, cooldown=0.05)
+    assert not asyncio.run(probe_survives_cancelled_request(host))
+    # The probe succeeded, so the host is back in service
+    assert host.circuit == "closed"